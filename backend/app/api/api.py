@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 
-from app.api.routes import files
+from app.api.routes import classify, files, jobs
 
 api_router = APIRouter()
-api_router.include_router(files.router, prefix="/files", tags=["files"]) 
\ No newline at end of file
+api_router.include_router(files.router, prefix="/files", tags=["files"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+api_router.include_router(classify.router, prefix="/classify", tags=["classify"]) 
\ No newline at end of file
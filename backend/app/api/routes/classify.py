@@ -0,0 +1,39 @@
+from typing import Dict
+from fastapi import APIRouter, Request, status
+
+from app.api.routes.files import classify_text
+from app.core.response_model import ResponseModel
+from app.models.classification import ClassificationRequest
+
+router = APIRouter()
+
+
+@router.post(
+    "/",
+    status_code=status.HTTP_200_OK,
+    response_model=ResponseModel[Dict[str, float]],
+    summary="Classify text",
+    description="""
+    Classify document text directly, without uploading or storing a file.
+    
+    Purpose:
+    - Get category predictions for text that has already been extracted
+    - Preview how a document would be classified before uploading it
+    
+    Input:
+    - text: The document text to classify (JSON body)
+    
+    Output format:
+    - Success: JSON with status "success" and data mapping each category to its
+      confidence score (0-1), highest first
+    
+    Texts too short to classify reliably are returned as "Other", as on upload.
+    
+    HTTP Status Codes:
+    - 200: Text classified successfully
+    - 422: Missing or empty text
+    """
+)
+async def classify(request: Request, body: ClassificationRequest):
+    category_prediction = await classify_text(body.text)
+    return ResponseModel.success(data=category_prediction)
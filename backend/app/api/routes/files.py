@@ -1,39 +1,505 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+import asyncio
+import logging
+import threading
+from functools import lru_cache
+from pathlib import PurePosixPath
+from celery import group
 from fastapi import APIRouter, HTTPException, status, UploadFile, File as FastAPIFile, Form, Query, Path, Depends, Request, BackgroundTasks
-import json
+import orjson
 import time
-import hashlib
 from datetime import datetime
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 
-from app.db.supabase import supabase_client, get_supabase_client
+from app.db.supabase import get_supabase_client
 from app.models.file import File, FileCreate, FileResponse, FileList
 from app.services.document_processor import DocumentProcessor
 from app.services.document_classifier import DocumentClassifier
-from app.core.exceptions import DocumentNotFound, InvalidFileFormat, StorageError, DatabaseError
+from app.services.classification_batcher import ClassificationBatcher
+from app.core.exceptions import APIError, DocumentNotFound, InvalidFileFormat, StorageError, DatabaseError
 from app.core.cache import RedisCache, cached
+from app.core.jobs import JobStore, JobStatus
 from app.core.monitoring import PerformanceMonitor
 from app.core.config import settings
 from app.core.response_model import ResponseModel
+from app.worker import reclassify_page
 
-# Initialize the document classifier (loads the model)
-try:
-    document_classifier = DocumentClassifier()
-except Exception as e:
-    print(f"Error initializing document classifier: {str(e)}")
-    # Create a mock classifier for fallback
-    class MockClassifier:
-        def classify_document(self, text):
-            return {"Other": 1.0}
-    document_classifier = MockClassifier()
+logger = logging.getLogger(__name__)
+
+
+class MockClassifier:
+    """Fallback classifier used when the document classifier cannot be initialized"""
+    def classify_document(self, text):
+        return {"Other": 1.0}
+    
+    def classify_batch(self, texts):
+        return [{"Other": 1.0} for _ in texts]
+
+
+# Guards the first load, which may be triggered from several worker threads at once
+_classifier_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _load_document_classifier():
+    try:
+        return DocumentClassifier()
+    except Exception as e:
+        logger.error(f"Error initializing document classifier: {str(e)}")
+        return MockClassifier()
+
+
+def get_document_classifier():
+    """
+    Get the shared document classifier, loading the model on first use
+    
+    Loading lazily keeps the model out of workers that never classify and
+    shortens startup; afterwards every request reuses the same instance.
+    """
+    with _classifier_lock:
+        return _load_document_classifier()
+
+
+# Concurrent uploads are classified together in batched model calls
+classification_batcher = ClassificationBatcher(get_document_classifier)
+
+# Texts shorter than this carry too little signal to be worth a model call, and
+# only the leading MAX_CLASSIFY_CHARS of longer texts are classified
+MIN_CLASSIFY_CHARS = 200
+MAX_CLASSIFY_CHARS = 8192
 
 router = APIRouter()
 
+# Redis key prefix and TTL for content hashes of stored files
+DUPLICATE_HASH_PREFIX = "filehash"
+DUPLICATE_HASH_TTL = 86400
+
+# File records are reserved by check_and_reserve while an upload is processed
+FILE_STATUS_PENDING = "pending"
+FILE_STATUS_READY = "ready"
+
+# Pending records older than this are treated as abandoned uploads and
+# reclaimed by check_and_reserve; well above the time to process any upload
+RESERVATION_TIMEOUT_SECONDS = 1800
+
+# File records rarely change after upload, so detail entries are cached for a day.
+# They hold the full extracted text, so they use the more compact msgpack encoding.
+FILE_DETAIL_PREFIX = "files:detail"
+FILE_DETAIL_TTL = 86400
+FILE_DETAIL_ENCODER = "msgpack"
+
+
+def file_detail_cache_key(*args, **kwargs) -> str:
+    """
+    Cache key builder for get_file, keyed only by file ID so that uploads
+    and deletes can write through and invalidate the same entry
+    """
+    return f"{FILE_DETAIL_PREFIX}:{kwargs['file_id']}"
+
+
+# List entries embed a version number; bumping it invalidates every cached page at once
+FILE_LIST_PREFIX = "files:list"
+FILE_LIST_VERSION_KEY = "files:list:version"
+
+
+# Total file counts are cached briefly so list pages rarely need a count query.
+# The unfiltered count is kept current on upload and delete; per-category counts expire.
+FILE_COUNT_PREFIX = "files:count"
+FILE_COUNT_TTL = 60
+
+
+def file_count_cache_key(category: Optional[str] = None) -> str:
+    """
+    Cache key for the total number of files, optionally within a category
+    """
+    return f"{FILE_COUNT_PREFIX}:{category or 'all'}"
+
+
+async def file_list_cache_key(*args, **kwargs) -> str:
+    """
+    Cache key builder for get_files that includes the current list version
+    """
+    version = await RedisCache.get(FILE_LIST_VERSION_KEY) or 0
+    return f"{FILE_LIST_PREFIX}:v{version}:{kwargs['limit']}:{kwargs['offset']}:{kwargs['category']}"
+
+
+def duplicate_file_response(duplicate: Dict[str, Any], content_hash: str) -> ORJSONResponse:
+    """
+    Build the 409 response returned when uploaded content already exists
+    """
+    duplicate_id = duplicate["id"]
+    duplicate_filename = duplicate["filename"]
+    
+    return ORJSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={
+            "status": "error",
+            "message": f"Duplicate file detected. This content has already been uploaded as '{duplicate_filename}'",
+            "data": {
+                "duplicate_id": duplicate_id,
+                "duplicate_filename": duplicate_filename,
+                "content_hash": content_hash
+            }
+        }
+    )
+
+
+async def hash_upload(file: UploadFile) -> Tuple[int, str, str]:
+    """
+    Stream an upload once to get its size, prefix hash and content hash
+    
+    The file size limit is enforced while streaming, so oversized uploads
+    are rejected without being read into memory.
+    
+    Returns:
+        Tuple of (file_size, prefix_hash, content_hash)
+    """
+    hasher = DocumentProcessor.content_hasher()
+    prefix = b""
+    file_size = 0
+    
+    await file.seek(0)
+    while chunk := await file.read(DocumentProcessor.STREAM_CHUNK_SIZE):
+        file_size += len(chunk)
+        if file_size > DocumentProcessor.MAX_FILE_SIZE:
+            raise InvalidFileFormat(
+                detail=f"File size exceeds maximum allowed size of {DocumentProcessor.MAX_FILE_SIZE / 1024 / 1024:.1f}MB",
+                error_code="FILE_TOO_LARGE"
+            )
+        if len(prefix) < DocumentProcessor.PREFIX_HASH_SIZE:
+            prefix += chunk[:DocumentProcessor.PREFIX_HASH_SIZE - len(prefix)]
+        hasher.update(chunk)
+    await file.seek(0)
+    
+    return file_size, DocumentProcessor.compute_prefix_hash(prefix), hasher.hexdigest()
+
+
+async def classify_text(extracted_text: str) -> Dict[str, float]:
+    """
+    Classify extracted document text, falling back to "Other" on any failure
+    or when there is too little text to classify
+    """
+    # Classify the document text if there is enough of it
+    category_prediction = {"Other": 1.0}  # Default classification
+    if extracted_text and len(extracted_text) >= MIN_CLASSIFY_CHARS:
+        try:
+            logger.debug(f"Attempting document classification on text of length {len(extracted_text)}")
+            # Get document classification, batched with other concurrent uploads
+            classification_result = await classification_batcher.submit(extracted_text[:MAX_CLASSIFY_CHARS])
+            
+            # Verify result is a valid dictionary
+            if isinstance(classification_result, dict) and len(classification_result) > 0:
+                category_prediction = classification_result
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Classification succeeded: {orjson.dumps(category_prediction).decode()}")
+            else:
+                logger.warning(f"Classification returned invalid result: {classification_result}")
+        except Exception as classify_err:
+            # If classification fails, log but continue with default prediction
+            logger.warning(f"Classification error: {str(classify_err)}")
+            # Set a default category instead of failing
+            category_prediction = {"Other": 1.0}
+    
+    return category_prediction
+
+
+def upload_to_storage(supabase, unique_filename: str, file_content: bytes) -> str:
+    """
+    Upload file content to Supabase Storage
+    
+    Returns:
+        Public URL of the stored file
+        
+    Raises:
+        StorageError: If the upload fails
+    """
+    try:
+        # Upload file to Supabase Storage
+        logger.debug(f"Uploading file to storage: {unique_filename}")
+        upload_result = supabase.storage.from_(settings.SUPABASE_STORAGE_BUCKET).upload(
+            unique_filename,
+            file_content
+        )
+        
+        # UploadResponse is not iterable, check for error differently
+        if upload_result is None:
+            raise StorageError(
+                detail="Upload failed with null response",
+                error_code="STORAGE_UPLOAD_FAILED"
+            )
+            
+        # Get public URL - if we got here, the upload was successful
+        logger.debug("Getting public URL")
+        file_path = supabase.storage.from_(settings.SUPABASE_STORAGE_BUCKET).get_public_url(unique_filename)
+        
+    except Exception as storage_err:
+        # If storage upload fails, provide a clear error
+        logger.error(f"Storage error: {str(storage_err)}")
+        raise StorageError(
+            detail=f"Error uploading file to storage: {str(storage_err)}",
+            error_code="STORAGE_ERROR"
+        )
+    
+    return file_path
+
+
+async def store_upload(
+    supabase,
+    file_id: Any,
+    file_content: bytes,
+    filename: str,
+    file_ext: str,
+    content_type: str,
+    file_size: int,
+    prefix_hash: str,
+    content_hash: str
+) -> Dict[str, Any]:
+    """
+    Extract, classify and store a validated, non-duplicate upload, filling in
+    the file record reserved for it by check_and_reserve
+    
+    Returns:
+        Response dictionary with status, message and the stored file data
+        
+    Raises:
+        InvalidFileFormat: If text cannot be extracted from the file
+        StorageError: If the file cannot be uploaded to storage
+        DatabaseError: If the file record cannot be updated
+    """
+    # Extract text content from the file for classification and storage
+    logger.debug("Extracting text content")
+    try:
+        extracted_text, extraction_error = await asyncio.to_thread(
+            DocumentProcessor.extract_text,
+            file_content, 
+            content_type,
+            filename,
+            content_hash
+        )
+        
+        # If text extraction failed, return an error
+        if extraction_error and not extracted_text:
+            logger.warning(f"Text extraction failed: {extraction_error}")
+            logger.warning(f"File details: content_type={content_type}, filename={filename}, size={len(file_content)} bytes")
+            
+            # If it's a PDF, log specific details
+            if content_type == "application/pdf":
+                logger.warning(f"PDF validation: Has PDF header: {DocumentProcessor.find_pdf_header(file_content) >= 0}")
+                
+                # Re-parsing the PDF is expensive, so full diagnostics only run in debug
+                # mode, and only when their debug log line will actually be emitted;
+                # the /diagnose-pdf/ endpoint provides them on demand
+                if settings.DEBUG and logger.isEnabledFor(logging.DEBUG):
+                    try:
+                        diagnostic = await asyncio.to_thread(DocumentProcessor.diagnose_pdf, file_content, filename)
+                        logger.debug(f"PDF diagnostic results: {orjson.dumps(diagnostic).decode()}")
+                    except Exception as e:
+                        logger.warning(f"Error checking PDF details: {str(e)}")
+            
+            raise InvalidFileFormat(
+                detail=f"Could not extract text from file: {extraction_error}",
+                error_code="TEXT_EXTRACTION_FAILED",
+                details={
+                    "content_type": content_type,
+                    "filename": filename,
+                    "file_size": len(file_content)
+                }
+            )
+    except Exception as extract_err:
+        logger.warning(f"Exception during text extraction: {str(extract_err)}")
+        raise InvalidFileFormat(
+            detail=f"Error during text extraction: {str(extract_err)}",
+            error_code="TEXT_EXTRACTION_ERROR"
+        )
+    
+    # Generate a unique file name for storage; the original name is kept on the record
+    timestamp = int(time.time())
+    unique_filename = f"{timestamp}_{content_hash}{file_ext}"
+    
+    # Classification and the storage upload are independent, so run them concurrently
+    category_prediction, file_path = await asyncio.gather(
+        classify_text(extracted_text),
+        asyncio.to_thread(upload_to_storage, supabase, unique_filename, file_content)
+    )
+    
+    # Create database record
+    logger.debug("Preparing database record")
+    try:
+        # Create file record with classification results
+        simple_file_data = {
+            "filename": str(filename),
+            "content_type": str(content_type),
+            "size": file_size,
+            "content_hash": content_hash,
+            "prefix_hash": prefix_hash,
+            "file_path": file_path,
+            "content": extracted_text if extracted_text else "",
+            "category_prediction": category_prediction,  # Stored as jsonb, no serialization needed
+            "status": FILE_STATUS_READY
+        }
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Using data with classification for database update: {orjson.dumps(simple_file_data).decode()}")
+        
+        # Complete the reserved record with the data including classification
+        result = await asyncio.to_thread(
+            supabase.table("files").update(simple_file_data).eq("id", file_id).execute
+        )
+        
+        # An update matching no row means the reservation no longer exists: it was
+        # reclaimed by check_and_reserve after timing out, or deleted meanwhile
+        if not result or not result.data:
+            error_details = {"file_id": file_id, "result": str(result)}
+            logger.error(f"Reserved file record not found: {error_details}")
+            raise DatabaseError(
+                detail="Reserved file record no longer exists",
+                error_code="DATABASE_UPDATE_FAILED",
+                details=error_details
+            )
+        
+        # Cached list pages no longer include every file
+        await RedisCache.incr(FILE_LIST_VERSION_KEY)
+        await RedisCache.incr_if_exists(file_count_cache_key(), 1)
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Database update succeeded with response: {orjson.dumps(result.data).decode()}")
+        
+        db_file = result.data[0]
+        
+        await RedisCache.set(
+            f"{DUPLICATE_HASH_PREFIX}:{content_hash}",
+            {"id": db_file.get("id"), "filename": db_file.get("filename")},
+            DUPLICATE_HASH_TTL
+        )
+        
+        # Warm the detail cache so the first read skips the database
+        await RedisCache.set(
+            file_detail_cache_key(file_id=db_file.get("id")),
+            {"status": "success", "data": db_file},
+            FILE_DETAIL_TTL,
+            FILE_DETAIL_ENCODER
+        )
+        
+        # Prepare the response with the db record
+        logger.debug("Preparing success response from DB record")
+        try:
+            # category_prediction is a jsonb column and arrives already parsed
+            category_prediction_data = db_file.get("category_prediction") or {"Other": 1.0}
+            
+            return {
+                "status": "success",
+                "message": "File uploaded successfully",
+                "data": {
+                    "id": db_file.get("id"),
+                    "filename": db_file.get("filename"),
+                    "content_type": db_file.get("content_type"),
+                    "size": db_file.get("size"),
+                    "content_hash": db_file.get("content_hash"),
+                    "file_path": db_file.get("file_path"),
+                    "content": db_file.get("content"),
+                    "category_prediction": category_prediction_data,
+                    "extraction_error": db_file.get("extraction_error"),
+                    "uploaded_at": db_file.get("uploaded_at")
+                }
+            }
+        except Exception as resp_err:
+            logger.error(f"Error preparing response from DB: {str(resp_err)}")
+            # Fall back to minimal successful response
+            return {
+                "status": "success",
+                "message": "File uploaded, but error preparing response",
+                "data": {
+                    "filename": filename,
+                    "content_hash": content_hash,
+                    "file_path": file_path
+                }
+            }
+        
+    except Exception as db_err:
+        # If database insert fails, delete the file from storage
+        try:
+            await asyncio.to_thread(
+                supabase.storage.from_(settings.SUPABASE_STORAGE_BUCKET).remove,
+                [unique_filename]
+            )
+        except Exception as cleanup_err:
+            # Ignore error when trying to clean up storage
+            logger.warning(f"Failed to clean up storage after database error: {str(cleanup_err)}")
+            pass
+            
+        # Get more details from the database error
+        error_details = {}
+        if hasattr(db_err, "response") and hasattr(db_err.response, "json"):
+            try:
+                error_json = db_err.response.json()
+                error_details = {"response": error_json}
+                logger.error(f"Database error response: {error_json}")
+            except:
+                pass
+                
+        raise DatabaseError(
+            detail=f"Error storing file metadata: {str(db_err)}",
+            error_code="DATABASE_ERROR",
+            details=error_details
+        )
+
+
+async def release_reservation(supabase, file_id: Any) -> None:
+    """
+    Delete a file record reserved by check_and_reserve whose upload failed,
+    so the same content can be uploaded again
+    """
+    try:
+        await asyncio.to_thread(
+            supabase.table("files").delete().eq("id", file_id).eq("status", FILE_STATUS_PENDING).execute
+        )
+    except Exception as e:
+        logger.error(f"Failed to release reserved file record {file_id}: {str(e)}")
+
+
+async def process_upload(job_id: str, supabase, **upload: Any) -> None:
+    """
+    Background task that processes an accepted upload and records the outcome on its job
+    
+    Blocking stages of store_upload run in worker threads, so the event loop
+    stays free while files are extracted, classified and stored.
+    """
+    await JobStore.update(job_id, JobStatus.PROCESSING)
+    try:
+        response = await store_upload(supabase, **upload)
+        await JobStore.update(job_id, JobStatus.COMPLETED, message=response["message"], result=response["data"])
+    except APIError as api_err:
+        await release_reservation(supabase, upload["file_id"])
+        await JobStore.update(
+            job_id,
+            JobStatus.FAILED,
+            error={
+                "error": api_err.error_code,
+                "message": api_err.detail,
+                "details": api_err.details
+            }
+        )
+    except Exception as e:
+        logger.exception(f"Unexpected error processing upload job {job_id}: {type(e).__name__} - {str(e)}")
+        await release_reservation(supabase, upload["file_id"])
+        await JobStore.update(
+            job_id,
+            JobStatus.FAILED,
+            error={
+                "error": "UNEXPECTED_ERROR",
+                "message": "An unexpected error occurred while processing your file",
+                "details": {
+                    "error_type": type(e).__name__,
+                    "error_detail": str(e) if settings.DEBUG else "See server logs for details"
+                }
+            }
+        )
+
 
 @router.post(
     "/upload/", 
-    response_model=FileResponse, 
-    status_code=status.HTTP_201_CREATED,
+    response_model=ResponseModel[Dict[str, Any]], 
+    status_code=status.HTTP_202_ACCEPTED,
     summary="Upload a document file",
     description="""
     Upload a document file to the system.
@@ -47,328 +513,125 @@ router = APIRouter()
     Input:
     - file: An uploaded file (PDF, DOCX, TXT, etc.)
     
+    Validation and duplicate detection happen during the request. Text extraction,
+    classification, storage and the database insert run in the background; poll
+    GET /api/v1/jobs/{job_id} for the stored file data or the processing error.
+    
     Output format:
-    - Success: JSON with status "success", message, and file data including ID, filename, path, classification results
+    - Success: JSON with status "success", message, and job data including job_id and content hash
     - Error: JSON with status "error", error message, error code, and optional details
     
     HTTP Status Codes:
-    - 201: File uploaded successfully
+    - 202: File accepted for processing
     - 400: Invalid file format or validation error
     - 409: Duplicate file detected
-    - 500: Storage or database error
+    - 413: Request body larger than the upload limit, rejected from its Content-Length
+      before the body is read (clients sending "Expect: 100-continue" don't transmit it)
+    - 500: Unexpected error
     """
 )
 @PerformanceMonitor.monitor_endpoint
 async def upload_file(
     request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = FastAPIFile(..., description="The file to upload"),
     supabase: get_supabase_client = Depends(get_supabase_client)
 ):
     try:
-        # Validate file size
-        # Get file size by consuming a chunk
-        print("Starting file upload process")
-        file_first_chunk = await file.read(1024)  # Read first chunk to check if file is not empty
-        if not file_first_chunk:
-            raise InvalidFileFormat(
-                detail="Uploaded file is empty",
-                error_code="EMPTY_FILE"
-            )
-        
-        # Reset file position
-        await file.seek(0)
-        
-        # Read file content
-        print("Reading file content")
-        file_content = await file.read()
-        
-        # Check file size
-        if len(file_content) > DocumentProcessor.MAX_FILE_SIZE:
-            raise InvalidFileFormat(
-                detail=f"File size exceeds maximum allowed size of {DocumentProcessor.MAX_FILE_SIZE / 1024 / 1024:.1f}MB",
-                error_code="FILE_TOO_LARGE"
-            )
-            
         # Validate content type
+        logger.debug("Starting file upload process")
         content_type = file.content_type
-        if content_type not in DocumentProcessor.SUPPORTED_CONTENT_TYPES:
+        expected_extensions = DocumentProcessor.EXTENSIONS_BY_CONTENT_TYPE.get(content_type)
+        if expected_extensions is None:
             raise InvalidFileFormat(
-                detail=f"Unsupported file type: {content_type}. Supported types: {', '.join(DocumentProcessor.SUPPORTED_CONTENT_TYPES.keys())}",
+                detail=f"Unsupported file type: {content_type}. Supported types: {DocumentProcessor.SUPPORTED_CONTENT_TYPES_STR}",
                 error_code="UNSUPPORTED_FILE_TYPE"
             )
             
         # Validate file extension
-        print("Validating file extension")
-        original_filename = file.filename
-        _, file_ext = original_filename.lower().rsplit('.', 1) if '.' in original_filename else ('', '')
-        expected_extensions = DocumentProcessor.SUPPORTED_CONTENT_TYPES.get(content_type, [])
-        if f".{file_ext}" not in expected_extensions:
+        logger.debug("Validating file extension")
+        file_ext = PurePosixPath(file.filename).suffix.lower()
+        if file_ext not in expected_extensions:
             raise InvalidFileFormat(
-                detail=f"File extension '.{file_ext}' does not match content type {content_type}. Expected: {', '.join(expected_extensions)}",
+                detail=f"File extension '{file_ext}' does not match content type {content_type}. Expected: {', '.join(sorted(expected_extensions))}",
                 error_code="INVALID_FILE_EXTENSION"
             )
         
-        # Generate a hash of the file content to check for duplicates
-        print("Generating content hash")
-        content_hash = hashlib.md5(file_content).hexdigest()
-        
-        # First extract text content from the file for both duplicate detection and storage
-        print("Extracting text content")
-        try:
-            extracted_text, extraction_error = DocumentProcessor.extract_text(
-                file_content, 
-                file.content_type,
-                file.filename
-            )
-            
-            # If text extraction failed, return an error
-            if extraction_error and not extracted_text:
-                print(f"Text extraction failed: {extraction_error}")
-                print(f"File details: content_type={file.content_type}, filename={file.filename}, size={len(file_content)} bytes")
-                
-                # If it's a PDF, log specific details
-                if file.content_type == "application/pdf":
-                    try:
-                        # Check if it has PDF header
-                        has_pdf_header = file_content.startswith(b'%PDF-')
-                        print(f"PDF validation: Has PDF header: {has_pdf_header}")
-                        if not has_pdf_header:
-                            print(f"Invalid PDF: Missing PDF header signature")
-                            
-                        # Use the diagnostic function for more detailed information
-                        diagnostic = DocumentProcessor.diagnose_pdf(file_content, file.filename)
-                        print(f"PDF diagnostic results: {json.dumps(diagnostic)}")
-                    except Exception as e:
-                        print(f"Error checking PDF details: {str(e)}")
-                
-                raise InvalidFileFormat(
-                    detail=f"Could not extract text from file: {extraction_error}",
-                    error_code="TEXT_EXTRACTION_FAILED",
-                    details={
-                        "content_type": file.content_type,
-                        "filename": file.filename,
-                        "file_size": len(file_content)
-                    }
-                )
-        except Exception as extract_err:
-            print(f"Exception during text extraction: {str(extract_err)}")
+        # Stream the upload to check its size and hash it without buffering it
+        logger.debug("Hashing file content")
+        file_size, prefix_hash, content_hash = await hash_upload(file)
+        if file_size == 0:
             raise InvalidFileFormat(
-                detail=f"Error during text extraction: {str(extract_err)}",
-                error_code="TEXT_EXTRACTION_ERROR"
+                detail="Uploaded file is empty",
+                error_code="EMPTY_FILE"
             )
         
-        # Check for duplicates based on content hash
-        print("Checking for duplicates")
-        # First check if a file with the same hash already exists
-        duplicate_check = supabase.table("files").select("id, filename").eq("content_hash", content_hash).execute()
-        if duplicate_check.data and len(duplicate_check.data) > 0:
-            # Return information about the duplicate file
-            duplicate = duplicate_check.data[0]
-            duplicate_id = duplicate["id"]
-            duplicate_filename = duplicate["filename"]
-            
-            # Return direct JSONResponse with 409 status code
-            return JSONResponse(
-                status_code=status.HTTP_409_CONFLICT,
-                content={
-                    "status": "error",
-                    "message": f"Duplicate file detected. This content has already been uploaded as '{duplicate_filename}'",
-                    "data": {
-                        "duplicate_id": duplicate_id,
-                        "duplicate_filename": duplicate_filename,
-                        "content_hash": content_hash
-                    }
-                }
-            )
+        logger.debug("Checking for duplicates")
         
-        # Generate a unique file name for storage
-        timestamp = int(time.time())
-        unique_filename = f"{timestamp}_{content_hash}_{file.filename.replace(' ', '_')}"
+        # Known hashes are cached in Redis, which avoids the database round-trip
+        duplicate = await RedisCache.get(f"{DUPLICATE_HASH_PREFIX}:{content_hash}")
+        if duplicate:
+            return duplicate_file_response(duplicate, content_hash)
         
-        # Classify the document text if available
-        category_prediction = {"Other": 1.0}  # Default classification
-        if extracted_text:
-            try:
-                print(f"Attempting document classification on text of length {len(extracted_text)}")
-                # First check if document classifier is initialized
-                if hasattr(document_classifier, 'classify_document') and callable(getattr(document_classifier, 'classify_document')):
-                    # Get document classification using the classifier
-                    classification_result = document_classifier.classify_document(extracted_text)
-                    
-                    # Verify result is a valid dictionary
-                    if isinstance(classification_result, dict) and len(classification_result) > 0:
-                        category_prediction = classification_result
-                        print(f"Classification succeeded: {json.dumps(category_prediction)}")
-                    else:
-                        print(f"Classification returned invalid result: {classification_result}")
-                else:
-                    print("Document classifier doesn't have classify_document method")
-            except Exception as classify_err:
-                # If classification fails, log but continue with default prediction
-                print(f"Classification error: {str(classify_err)}")
-                # Set a default category instead of failing
-                category_prediction = {"Other": 1.0}
+        # Check for a duplicate and reserve a record for this upload in one
+        # atomic round-trip, so concurrent uploads of the same content can't both pass.
+        # The RPC may wait on an advisory lock, so it runs in a worker thread.
+        reservation = (await asyncio.to_thread(
+            supabase.rpc(
+                "check_and_reserve",
+                {
+                    "p_hash": content_hash,
+                    "p_prefix_hash": prefix_hash,
+                    "p_filename": file.filename,
+                    "p_content_type": content_type,
+                    "p_size": file_size,
+                    "p_reservation_timeout_seconds": RESERVATION_TIMEOUT_SECONDS
+                }
+            ).execute
+        )).data
+        
+        if reservation.get("duplicate_id") is not None:
+            duplicate = {"id": reservation["duplicate_id"], "filename": reservation["duplicate_filename"]}
+            # Records still being processed may yet be released, so only cache stored ones
+            if reservation.get("duplicate_status") == FILE_STATUS_READY:
+                await RedisCache.set(f"{DUPLICATE_HASH_PREFIX}:{content_hash}", duplicate, DUPLICATE_HASH_TTL)
+            return duplicate_file_response(duplicate, content_hash)
         
+        # Until process_upload is scheduled, nothing else releases the reservation
         try:
-            # Upload file to Supabase Storage
-            print(f"Uploading file to storage: {unique_filename}")
-            upload_result = supabase.storage.from_(settings.SUPABASE_STORAGE_BUCKET).upload(
-                unique_filename,
-                file_content
-            )
+            # Only new content is read into memory for extraction and storage
+            logger.debug("Reading file content")
+            file_content = await file.read()
             
-            # UploadResponse is not iterable, check for error differently
-            if upload_result is None:
-                raise StorageError(
-                    detail="Upload failed with null response",
-                    error_code="STORAGE_UPLOAD_FAILED"
-                )
-                
-            # Get public URL - if we got here, the upload was successful
-            print("Getting public URL")
-            file_path = supabase.storage.from_(settings.SUPABASE_STORAGE_BUCKET).get_public_url(unique_filename)
-            
-        except Exception as storage_err:
-            # If storage upload fails, provide a clear error
-            print(f"Storage error: {str(storage_err)}")
-            raise StorageError(
-                detail=f"Error uploading file to storage: {str(storage_err)}",
-                error_code="STORAGE_ERROR"
+            # Track processing as a job so the client can poll for the result
+            job_id = await JobStore.create(filename=file.filename, content_hash=content_hash)
+            background_tasks.add_task(
+                process_upload,
+                job_id,
+                supabase,
+                file_id=reservation["id"],
+                file_content=file_content,
+                filename=file.filename,
+                file_ext=file_ext,
+                content_type=file.content_type,
+                file_size=file_size,
+                prefix_hash=prefix_hash,
+                content_hash=content_hash
             )
+        except Exception:
+            await release_reservation(supabase, reservation["id"])
+            raise
         
-        # Create database record
-        print("Preparing database record")
-        try:
-            # Create file record with classification results
-            simple_file_data = {
-                "filename": str(file.filename),
-                "content_type": str(file.content_type),
-                "size": len(file_content),
-                "content_hash": content_hash,
-                "file_path": file_path,
-                "content": extracted_text if extracted_text else "",
-                "category_prediction": json.dumps(category_prediction)  # Include classification results
+        return {
+            "status": "success",
+            "message": "File accepted for processing",
+            "data": {
+                "job_id": job_id,
+                "job_status": JobStatus.PENDING,
+                "filename": file.filename,
+                "content_hash": content_hash
             }
-            
-            print(f"Using data with classification for database insert: {json.dumps(simple_file_data)}")
-            
-            # Try insert with the data including classification
-            result = supabase.table("files").insert(simple_file_data).execute()
-            
-            # Check if we got a response with data
-            if result and hasattr(result, 'data'):
-                print(f"Database insert succeeded with response: {json.dumps(result.data) if result.data else 'empty data'}")
-                
-                # Even if data is empty, if we didn't get an error, assume it succeeded
-                if not result.data:
-                    # Return simple success response when data is empty
-                    return {
-                        "status": "success",
-                        "message": "File uploaded successfully",
-                        "data": {
-                            "filename": file.filename,
-                            "content_type": file.content_type,
-                            "content_hash": content_hash,
-                            "file_path": file_path,
-                        }
-                    }
-                
-                # Get the created record if available
-                db_file = result.data[0] if result.data and len(result.data) > 0 else None
-                
-                # If we have a DB file record, use it for response, otherwise use minimal data
-                if db_file:
-                    # Prepare the response with the db record
-                    print("Preparing success response from DB record")
-                    try:
-                        # Safely parse the category prediction JSON
-                        category_prediction_data = {"Other": 1.0}  # Default
-                        if db_file.get("category_prediction"):
-                            try:
-                                if isinstance(db_file["category_prediction"], str):
-                                    category_prediction_data = json.loads(db_file["category_prediction"])
-                                else:
-                                    category_prediction_data = db_file["category_prediction"]
-                            except json.JSONDecodeError:
-                                print(f"Error parsing JSON from category_prediction: {db_file.get('category_prediction')}")
-                        
-                        return {
-                            "status": "success",
-                            "message": "File uploaded successfully",
-                            "data": {
-                                "id": db_file.get("id"),
-                                "filename": db_file.get("filename"),
-                                "content_type": db_file.get("content_type"),
-                                "size": db_file.get("size"),
-                                "content_hash": db_file.get("content_hash"),
-                                "file_path": db_file.get("file_path"),
-                                "content": db_file.get("content"),
-                                "category_prediction": category_prediction_data,
-                                "extraction_error": db_file.get("extraction_error"),
-                                "uploaded_at": db_file.get("uploaded_at")
-                            }
-                        }
-                    except Exception as resp_err:
-                        print(f"Error preparing response from DB: {str(resp_err)}")
-                        # Fall back to minimal successful response
-                        return {
-                            "status": "success",
-                            "message": "File uploaded, but error preparing response",
-                            "data": {
-                                "filename": file.filename,
-                                "content_hash": content_hash,
-                                "file_path": file_path
-                            }
-                        }
-                else:
-                    # Return minimal success response
-                    return {
-                        "status": "success",
-                        "message": "File uploaded successfully",
-                        "data": {
-                            "filename": file.filename,
-                            "content_type": file.content_type,
-                            "content_hash": content_hash,
-                            "file_path": file_path,
-                        }
-                    }
-            else:
-                # No result or no data property
-                error_message = "Error inserting file record into database"
-                error_details = {"result": str(result)}
-                
-                print(f"Database error details: {error_details}")
-                
-                raise DatabaseError(
-                    detail=error_message,
-                    error_code="DATABASE_INSERT_FAILED",
-                    details=error_details
-                )
-            
-        except Exception as db_err:
-            # If database insert fails, delete the file from storage
-            try:
-                supabase.storage.from_(settings.SUPABASE_STORAGE_BUCKET).remove([unique_filename])
-            except Exception as cleanup_err:
-                # Ignore error when trying to clean up storage
-                print(f"Failed to clean up storage after database error: {str(cleanup_err)}")
-                pass
-                
-            # Get more details from the database error
-            error_details = {}
-            if hasattr(db_err, "response") and hasattr(db_err.response, "json"):
-                try:
-                    error_json = db_err.response.json()
-                    error_details = {"response": error_json}
-                    print(f"Database error response: {error_json}")
-                except:
-                    pass
-                    
-            raise DatabaseError(
-                detail=f"Error storing file metadata: {str(db_err)}",
-                error_code="DATABASE_ERROR",
-                details=error_details
-            )
+        }
             
     except InvalidFileFormat as format_err:
         # Return detailed validation errors with 400 status
@@ -378,46 +641,22 @@ async def upload_file(
             "error": format_err.error_code,
             "details": getattr(format_err, "details", None)
         }
-        print(f"Validation error response: {json.dumps(error_response)}")
-        return JSONResponse(
+        logger.debug(f"Validation error response: {error_response}")
+        return ORJSONResponse(
             status_code=status.HTTP_400_BAD_REQUEST,
             content=error_response
         )
         
-    except StorageError as storage_err:
-        # Return storage errors with 500 status
-        return JSONResponse(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            content={
-                "status": "error",
-                "message": str(storage_err),
-                "error": storage_err.error_code,
-                "details": getattr(storage_err, "details", None)
-            }
-        )
-        
-    except DatabaseError as db_err:
-        # Return database errors with 500 status
-        return JSONResponse(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            content={
-                "status": "error",
-                "message": str(db_err),
-                "error": db_err.error_code,
-                "details": getattr(db_err, "details", None)
-            }
-        )
-        
     except Exception as e:
         # Catch-all for unexpected errors
         error_detail = str(e)
         error_type = type(e).__name__
         
         # Log the error for debugging
-        print(f"Unexpected error during file upload: {error_type} - {error_detail}")
+        logger.exception(f"Unexpected error during file upload: {error_type} - {error_detail}")
         
         # Return a generic error message
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={
                 "status": "error",
@@ -446,7 +685,7 @@ async def upload_file(
     Input:
     - limit: Maximum number of files to return (default: 50, range: 1-100)
     - offset: Number of files to skip for pagination (default: 0)
-    - category: Optional category name to filter results
+    - category: Optional category name; only files whose top predicted category matches are returned
     
     Output format:
     - Success: JSON with status "success", data array of file objects, and pagination information
@@ -458,42 +697,41 @@ async def upload_file(
     """
 )
 @PerformanceMonitor.monitor_endpoint
-@cached(prefix="files:list")
+@cached(prefix=FILE_LIST_PREFIX, key_builder=file_list_cache_key)
 async def get_files(
     request: Request,
     limit: int = Query(50, ge=1, le=100, description="Maximum number of files to return"),
     offset: int = Query(0, ge=0, description="Number of files to skip"),
-    category: Optional[str] = Query(None, description="Filter files by predicted category"),
+    category: Optional[str] = Query(None, description="Filter files by top predicted category"),
     supabase: get_supabase_client = Depends(get_supabase_client)
 ):
     try:
-        query = supabase.table("files").select("*").order("uploaded_at", desc=True)
+        # Only ask PostgREST for a total when no cached count is available, and
+        # then accept its planner estimate for large tables instead of a full COUNT(*)
+        count_key = file_count_cache_key(category)
+        total_count = await RedisCache.get(count_key)
+        query = (
+            supabase.table("files")
+            .select("*", count="estimated" if total_count is None else None)
+            .eq("status", FILE_STATUS_READY)
+            .order("uploaded_at", desc=True)
+        )
         
         # Apply category filter if specified
         if category:
-            # Note: This is a simple implementation and might need to be adjusted
-            # based on how category predictions are stored
-            query = query.filter("category_prediction", "cs", f'%"{category}"%')
+            # Match on the indexed top predicted category
+            query = query.eq("top_category", category)
             
         # Apply pagination
         query = query.range(offset, offset + limit - 1)
         
         response = query.execute()
-        
-        # Convert category_prediction strings to JSON objects if they're stored as strings
-        files = []
-        for file_data in response.data:
-            if file_data.get("category_prediction") and isinstance(file_data["category_prediction"], str):
-                try:
-                    file_data["category_prediction"] = json.loads(file_data["category_prediction"])
-                except json.JSONDecodeError:
-                    # If it's not valid JSON, keep it as is
-                    pass
-            files.append(file_data)
+        files = response.data
             
-        # Get total count for pagination
-        count_response = supabase.table("files").select("id", count="exact").execute()
-        total_count = count_response.count if hasattr(count_response, 'count') else len(files)
+        # Total count for pagination comes back with the page
+        if total_count is None:
+            total_count = response.count if response.count is not None else len(files)
+            RedisCache.set_in_background(count_key, total_count, FILE_COUNT_TTL)
         
         return {
             "status": "success",
@@ -535,26 +773,20 @@ async def get_files(
     """
 )
 @PerformanceMonitor.monitor_endpoint
-@cached(prefix="files:detail")
+@cached(prefix=FILE_DETAIL_PREFIX, ttl=FILE_DETAIL_TTL, key_builder=file_detail_cache_key, encoder=FILE_DETAIL_ENCODER)
 async def get_file(
     request: Request,
     file_id: int = Path(..., description="The ID of the file to retrieve"),
     supabase: get_supabase_client = Depends(get_supabase_client)
 ):
     try:
-        response = supabase.table("files").select("*").eq("id", file_id).execute()
+        # Records reserved for uploads still being processed are not yet files
+        response = supabase.table("files").select("*").eq("id", file_id).eq("status", FILE_STATUS_READY).execute()
         
         if not response.data:
             raise DocumentNotFound(file_id)
             
         file_data = response.data[0]
-        
-        # Convert category_prediction to JSON if it's a string
-        if file_data.get("category_prediction") and isinstance(file_data["category_prediction"], str):
-            try:
-                file_data["category_prediction"] = json.loads(file_data["category_prediction"])
-            except json.JSONDecodeError:
-                pass
                 
         return {
             "status": "success", 
@@ -600,12 +832,13 @@ async def delete_file(
 ):
     try:
         # First check if the file exists
-        response = supabase.table("files").select("file_path").eq("id", file_id).execute()
+        response = supabase.table("files").select("file_path, content_hash").eq("id", file_id).execute()
         
         if not response.data:
             raise DocumentNotFound(file_id)
             
         file_path = response.data[0].get("file_path")
+        content_hash = response.data[0].get("content_hash")
         
         # Delete from storage if path exists
         if file_path:
@@ -617,15 +850,18 @@ async def delete_file(
                 supabase.storage.from_(storage_bucket).remove([filename])
             except Exception as e:
                 # Log error but continue with database deletion
-                print(f"Error removing file from storage: {str(e)}")
+                logger.warning(f"Error removing file from storage: {str(e)}")
         
         # Delete from database
         delete_response = supabase.table("files").delete().eq("id", file_id).execute()
         
         # Clear caches
         if settings.CACHE_ENABLED:
-            RedisCache.delete(f"files:detail:{file_id}")
-            RedisCache.clear_pattern("files:list:*")
+            await RedisCache.delete(file_detail_cache_key(file_id=file_id))
+            if content_hash:
+                await RedisCache.delete(f"{DUPLICATE_HASH_PREFIX}:{content_hash}")
+            await RedisCache.incr(FILE_LIST_VERSION_KEY)
+            await RedisCache.incr_if_exists(file_count_cache_key(), -1)
         
         return {
             "status": "success",
@@ -648,6 +884,7 @@ async def delete_file(
     
     Input:
     - file: A PDF file to analyze
+    - verbose: Whether to also parse the PDF with PyPDF2 (default: true)
     
     Output format:
     - Success: JSON with diagnostic information about the PDF
@@ -657,12 +894,13 @@ async def delete_file(
 @PerformanceMonitor.monitor_endpoint
 async def diagnose_pdf(
     request: Request,
-    file: UploadFile = FastAPIFile(..., description="The PDF file to diagnose")
+    file: UploadFile = FastAPIFile(..., description="The PDF file to diagnose"),
+    verbose: bool = Query(True, description="Also parse the PDF with PyPDF2 and read its first page")
 ):
     try:
         # Validate the file is a PDF
         if file.content_type != "application/pdf" and not file.filename.lower().endswith('.pdf'):
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content={
                     "status": "error",
@@ -674,11 +912,12 @@ async def diagnose_pdf(
         # Read the file content
         file_content = await file.read()
         
-        # Run diagnostics
-        diagnostic = DocumentProcessor.diagnose_pdf(file_content, file.filename)
+        # Run diagnostics, in worker threads like store_upload's extraction so the event loop stays free
+        diagnostic = await asyncio.to_thread(DocumentProcessor.diagnose_pdf, file_content, file.filename, verbose)
         
         # Try extracting text with our main method
-        extracted_text, extraction_error = DocumentProcessor.extract_text(
+        extracted_text, extraction_error = await asyncio.to_thread(
+            DocumentProcessor.extract_text,
             file_content, 
             file.content_type,
             file.filename
@@ -699,7 +938,7 @@ async def diagnose_pdf(
         }
         
     except Exception as e:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={
                 "status": "error",
@@ -709,60 +948,120 @@ async def diagnose_pdf(
         )
 
 
+# Documents are classified and updated in pages of this size when reclassifying
+RECLASSIFY_PAGE_SIZE = 500
+
+# Number of IDs read per request when enumerating files to reclassify
+RECLASSIFY_ID_PAGE_SIZE = 1000
+
+
+def list_file_ids(supabase) -> List[Any]:
+    """
+    Get the IDs of all stored files with extracted content, in ID order
+    
+    Files without content are filtered out by the database, so they are
+    neither transferred nor queued for reclassification.
+    """
+    file_ids = []
+    offset = 0
+    while True:
+        page = (
+            supabase.table("files")
+            .select("id")
+            .eq("status", FILE_STATUS_READY)
+            .not_.is_("content", "null")
+            .neq("content", "")
+            .order("id")
+            .range(offset, offset + RECLASSIFY_ID_PAGE_SIZE - 1)
+            .execute()
+        )
+        rows = page.data or []
+        file_ids.extend(row["id"] for row in rows)
+        if len(rows) < RECLASSIFY_ID_PAGE_SIZE:
+            return file_ids
+        offset += RECLASSIFY_ID_PAGE_SIZE
+
+
+async def reclassify_documents(supabase, documents: List[Dict[str, Any]]) -> int:
+    """
+    Classify a page of documents with one model call and store the predictions
+    with one database call
+    
+    Args:
+        supabase: Supabase client
+        documents: File records with "id" and "content"
+        
+    Returns:
+        Number of documents reclassified
+    """
+    # Skip documents with too little content, as uploads do
+    documents = [
+        document for document in documents
+        if document.get('content') and len(document['content']) >= MIN_CLASSIFY_CHARS
+    ]
+    if not documents:
+        return 0
+    
+    classifier = get_document_classifier()
+    predictions = await asyncio.to_thread(
+        classifier.classify_batch,
+        [document['content'][:MAX_CLASSIFY_CHARS] for document in documents]
+    )
+    
+    # Write every prediction on the page in one statement
+    await asyncio.to_thread(
+        supabase.rpc(
+            "update_category_predictions",
+            {
+                "updates": [
+                    {"id": document['id'], "category_prediction": prediction}
+                    for document, prediction in zip(documents, predictions)
+                ]
+            }
+        ).execute
+    )
+    
+    # Drop the cached records and list pages so the new predictions are served
+    await RedisCache.delete(*(file_detail_cache_key(file_id=document['id']) for document in documents))
+    await RedisCache.incr(FILE_LIST_VERSION_KEY)
+    
+    return len(documents)
+
+
 @router.post("/reclassify-all/", response_model=ResponseModel[Dict[str, Any]])
 async def reclassify_all_documents(
-    background_tasks: BackgroundTasks,
     supabase: get_supabase_client = Depends(get_supabase_client)
 ):
     """
     Reclassify all documents in the database using the current classification model.
     
     This is useful when the classification model or its parameters have been updated.
-    The reclassification happens in the background to avoid timeout issues.
+    Documents are split into pages that are queued for the Celery classification
+    workers, so the work survives API restarts and is spread across workers.
     """
     try:
-        from app.services.document_classifier import DocumentClassifier
-        classifier = DocumentClassifier()
-        
-        # Get all document IDs and content from the database
-        result = supabase.table("files").select("id, content").execute()
+        file_ids = await asyncio.to_thread(list_file_ids, supabase)
         
-        if not result.data or len(result.data) == 0:
+        if not file_ids:
             return ResponseModel.success(
                 message="No documents found to reclassify",
                 data={"documents_found": 0, "reclassify_started": False}
             )
         
-        # Function to perform reclassification in the background
-        async def reclassify_documents():
-            for document in result.data:
-                try:
-                    # Skip documents with no content
-                    if not document.get('content'):
-                        continue
-                        
-                    # Reclassify the document
-                    prediction = classifier.predict(document['content'])
-                    
-                    # Update the database with new classification
-                    supabase.table("files").update(
-                        {"category_prediction": json.dumps(prediction)}
-                    ).eq("id", document['id']).execute()
-                    
-                except Exception as e:
-                    print(f"Error reclassifying document {document['id']}: {str(e)}")
-                    continue
-        
-        # Add the reclassification task to background tasks
-        background_tasks.add_task(reclassify_documents)
+        # Queue one task per page of IDs
+        pages = [
+            file_ids[start:start + RECLASSIFY_PAGE_SIZE]
+            for start in range(0, len(file_ids), RECLASSIFY_PAGE_SIZE)
+        ]
+        await asyncio.to_thread(group(reclassify_page.s(page) for page in pages).apply_async)
         
         return ResponseModel.success(
-            message=f"Reclassification of {len(result.data)} documents started",
-            data={"documents_found": len(result.data), "reclassify_started": True}
+            message=f"Reclassification of {len(file_ids)} documents started",
+            data={"documents_found": len(file_ids), "reclassify_started": True, "pages_queued": len(pages)}
         )
         
     except Exception as e:
-        print(f"Error in reclassify_all_documents: {str(e)}")
+        logger.exception(f"Error in reclassify_all_documents: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Error starting document reclassification: {str(e)}"
@@ -0,0 +1,44 @@
+from typing import Dict, Any
+from fastapi import APIRouter, Path, Request
+
+from app.core.exceptions import JobNotFound
+from app.core.jobs import JobStore
+from app.core.response_model import ResponseModel
+
+router = APIRouter()
+
+
+@router.get(
+    "/{job_id}",
+    response_model=ResponseModel[Dict[str, Any]],
+    summary="Get background job status",
+    description="""
+    Retrieve the status of a background job, such as processing an uploaded file.
+    
+    Purpose:
+    - Poll for completion of work accepted with a 202 response
+    - Retrieve the result once the job has completed
+    - Retrieve error information if the job failed
+    
+    Input:
+    - job_id: ID of the job returned when the work was accepted (path parameter)
+    
+    Output format:
+    - Success: JSON with status "success" and data object containing the job status
+      (pending, processing, completed or failed), result and error
+    - Error: JobNotFound exception
+    
+    HTTP Status Codes:
+    - 200: Job status retrieved successfully
+    - 404: Job not found or expired
+    """
+)
+async def get_job(
+    request: Request,
+    job_id: str = Path(..., description="The ID of the job to retrieve")
+):
+    job = await JobStore.get(job_id)
+    if job is None:
+        raise JobNotFound(job_id)
+        
+    return ResponseModel.success(data=job)
@@ -1,102 +1,243 @@
-import json
+import asyncio
+import inspect
 import logging
-from typing import Any, Optional, Dict, Union
+from typing import Any, Optional, Dict, Set, Union
 import time
 from functools import wraps
 
+import orjson
+import xxhash
+
 try:
-    import redis
+    import redis.asyncio as redis
     REDIS_AVAILABLE = True
 except ImportError:
     REDIS_AVAILABLE = False
 
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
 from app.core.config import settings
 
 logger = logging.getLogger("api.cache")
 
-# Initialize Redis client if available
+# Settings read on every cache call, bound once at import
+CACHE_ENABLED = settings.CACHE_ENABLED
+CACHE_TTL_SECONDS = settings.CACHE_TTL_SECONDS
+
+# INCRBY that leaves missing keys unset, so a counter is never rebuilt from zero
+INCR_IF_EXISTS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('INCRBY', KEYS[1], ARGV[1])
+end
+return nil
+"""
+
+# Values are stored as JSON by default. msgpack payloads are prefixed with 0xc1,
+# a byte msgpack never uses and JSON can't start with, so get() can tell them apart.
+MSGPACK_MARKER = b"\xc1"
+
+# Encoded values larger than this are zstd-compressed and prefixed with "Z".
+# Small values such as counters stay plain so Redis can still INCR them.
+ZSTD_MARKER = b"Z"
+ZSTD_MIN_SIZE = 1024
+
+if ZSTD_AVAILABLE:
+    zstd_compressor = zstandard.ZstdCompressor(level=3)
+    zstd_decompressor = zstandard.ZstdDecompressor()
+
+
+def serialize(value: Any, encoder: str = "json") -> bytes:
+    """Encode a value for storage in Redis"""
+    if encoder == "msgpack" and MSGPACK_AVAILABLE:
+        data = MSGPACK_MARKER + msgpack.packb(value, use_bin_type=True, default=str)
+    else:
+        # Handle non-serializable objects
+        data = orjson.dumps(value, default=str, option=orjson.OPT_SERIALIZE_NUMPY)
+        
+    if ZSTD_AVAILABLE and len(data) > ZSTD_MIN_SIZE:
+        return ZSTD_MARKER + zstd_compressor.compress(data)
+    return data
+
+
+def deserialize(data: bytes) -> Any:
+    """Decode a value stored by serialize()"""
+    if data.startswith(ZSTD_MARKER):
+        data = zstd_decompressor.decompress(data[1:])
+    if data.startswith(MSGPACK_MARKER):
+        return msgpack.unpackb(data[1:], raw=False)
+    return orjson.loads(data)
+
+
+# Initialize the async Redis client if available. Connections are opened lazily
+# from a shared pool; init_redis checks the server is reachable at startup.
 redis_client = None
-if REDIS_AVAILABLE and settings.CACHE_ENABLED:
-    try:
-        redis_client = redis.Redis(
+if REDIS_AVAILABLE and CACHE_ENABLED:
+    redis_client = redis.Redis(
+        connection_pool=redis.ConnectionPool(
             host=settings.REDIS_HOST,
             port=settings.REDIS_PORT,
             password=settings.REDIS_PASSWORD,
             db=settings.REDIS_DB,
             socket_timeout=5,
-            decode_responses=True,
+            socket_keepalive=True,
+            health_check_interval=30,
+            max_connections=64,
+            decode_responses=False,
         )
-        # Test connection
-        redis_client.ping()
+    )
+
+# References to fire-and-forget cache writes, so they aren't garbage collected mid-flight
+_pending_writes: Set[asyncio.Task] = set()
+
+# Results of cached functions currently being computed, so concurrent misses
+# for the same key wait for a single call instead of all running the function
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+async def init_redis() -> None:
+    """Check the Redis connection, disabling caching if the server is unreachable"""
+    global redis_client
+    if not redis_client:
+        return
+    
+    try:
+        await redis_client.ping()
         logger.info(f"Redis cache initialized at {settings.REDIS_HOST}:{settings.REDIS_PORT}")
     except Exception as e:
         logger.warning(f"Redis connection failed: {str(e)}. Caching will be disabled.")
+        await redis_client.connection_pool.disconnect()
         redis_client = None
 
 
+async def close_redis() -> None:
+    """Close the connections in the Redis connection pool"""
+    if redis_client:
+        await redis_client.connection_pool.disconnect()
+
+
 class RedisCache:
     """Redis-based caching for API responses"""
     
     @staticmethod
-    def get(key: str) -> Optional[Any]:
+    async def get(key: str) -> Optional[Any]:
         """Get value from cache"""
-        if not settings.CACHE_ENABLED or not redis_client:
+        if not CACHE_ENABLED or not redis_client:
             return None
             
         try:
-            data = redis_client.get(key)
+            data = await redis_client.get(key)
             if data:
-                return json.loads(data)
+                return deserialize(data)
             return None
         except Exception as e:
             logger.error(f"Cache get error: {str(e)}")
             return None
     
     @staticmethod
-    def set(key: str, value: Any, expiration: int = None) -> bool:
-        """Set value in cache with expiration in seconds"""
-        if not settings.CACHE_ENABLED or not redis_client:
+    async def set(key: str, value: Any, expiration: int = None, encoder: str = "json") -> bool:
+        """
+        Set value in cache with expiration in seconds
+        
+        Args:
+            encoder: "json", or "msgpack" for a more compact binary encoding of large values
+        """
+        if not CACHE_ENABLED or not redis_client:
             return False
             
         if expiration is None:
-            expiration = settings.CACHE_TTL_SECONDS
+            expiration = CACHE_TTL_SECONDS
             
         try:
-            serialized = json.dumps(value, default=str)  # Handle non-serializable objects
-            return redis_client.setex(key, expiration, serialized)
+            return await redis_client.setex(key, expiration, serialize(value, encoder))
         except Exception as e:
             logger.error(f"Cache set error: {str(e)}")
             return False
     
     @staticmethod
-    def delete(key: str) -> bool:
-        """Delete key from cache"""
-        if not settings.CACHE_ENABLED or not redis_client:
+    def set_in_background(key: str, value: Any, expiration: int = None, encoder: str = "json") -> None:
+        """Set value in cache without waiting for the write to complete"""
+        if not CACHE_ENABLED or not redis_client:
+            return
+        
+        task = asyncio.create_task(RedisCache.set(key, value, expiration, encoder))
+        _pending_writes.add(task)
+        task.add_done_callback(_pending_writes.discard)
+    
+    @staticmethod
+    async def delete(*keys: str) -> bool:
+        """Delete one or more keys from cache in a single command, freeing values in the background"""
+        if not CACHE_ENABLED or not redis_client or not keys:
             return False
             
         try:
-            return bool(redis_client.delete(key))
+            return bool(await redis_client.unlink(*keys))
         except Exception as e:
             logger.error(f"Cache delete error: {str(e)}")
             return False
     
     @staticmethod
-    def clear_pattern(pattern: str) -> bool:
-        """Clear all keys matching pattern"""
-        if not settings.CACHE_ENABLED or not redis_client:
+    async def incr(key: str) -> Optional[int]:
+        """Atomically increment an integer counter, returning the new value"""
+        if not CACHE_ENABLED or not redis_client:
+            return None
+            
+        try:
+            return await redis_client.incr(key)
+        except Exception as e:
+            logger.error(f"Cache incr error: {str(e)}")
+            return None
+    
+    @staticmethod
+    async def incr_if_exists(key: str, amount: int = 1) -> Optional[int]:
+        """Adjust an existing integer counter by amount, returning the new value"""
+        if not CACHE_ENABLED or not redis_client:
+            return None
+            
+        try:
+            return await redis_client.eval(INCR_IF_EXISTS_SCRIPT, 1, key, amount)
+        except Exception as e:
+            logger.error(f"Cache incr_if_exists error: {str(e)}")
+            return None
+    
+    @staticmethod
+    async def clear_pattern(pattern: str, count: int = 1000, batch_size: int = 500) -> bool:
+        """
+        Clear all keys matching pattern
+        
+        Matching keys are collected with SCAN and removed with UNLINK, which frees
+        values in the background, in batches sent together in one pipeline.
+        
+        Args:
+            pattern: Glob-style key pattern
+            count: Number of keys Redis examines per SCAN call
+            batch_size: Maximum number of keys per UNLINK command
+        """
+        if not CACHE_ENABLED or not redis_client:
             return False
             
         try:
-            cursor = 0
-            deleted_keys = 0
+            pipe = redis_client.pipeline(transaction=False)
+            batch = []
             
-            while True:
-                cursor, keys = redis_client.scan(cursor, match=pattern, count=100)
-                if keys:
-                    deleted_keys += redis_client.delete(*keys)
-                if cursor == 0:
-                    break
-                    
+            async for key in redis_client.scan_iter(match=pattern, count=count):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    pipe.unlink(*batch)
+                    batch = []
+            if batch:
+                pipe.unlink(*batch)
+                
+            deleted_keys = sum(await pipe.execute())
             logger.info(f"Cleared {deleted_keys} keys matching pattern: {pattern}")
             return True
         except Exception as e:
@@ -104,55 +245,80 @@ class RedisCache:
             return False
 
 
-def cached(prefix: str, ttl: int = None, key_builder=None):
+def cached(prefix: str, ttl: int = None, key_builder=None, encoder: str = "json"):
     """
     Decorator to cache function results in Redis
     
     Args:
         prefix: Cache key prefix
         ttl: Cache TTL in seconds (overrides settings.CACHE_TTL_SECONDS)
-        key_builder: Optional function to build cache key from args and kwargs
+        key_builder: Optional function (or coroutine function) to build cache key from args and kwargs
+        encoder: Serialization used for cached results ("json" or "msgpack")
     """
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            if not settings.CACHE_ENABLED or not redis_client:
+            if not CACHE_ENABLED or not redis_client:
                 return await func(*args, **kwargs)
             
             # Build cache key
             if key_builder:
                 cache_key = key_builder(*args, **kwargs)
+                if inspect.isawaitable(cache_key):
+                    cache_key = await cache_key
             else:
-                # Default key builder concatenates serialized args and kwargs
-                key_parts = [prefix, func.__name__]
-                
-                # Add args to key
-                for arg in args:
-                    if hasattr(arg, '__dict__'):
-                        continue  # Skip complex objects like request
-                    key_parts.append(str(arg))
-                
-                # Add kwargs to key (sorted for consistency)
-                for k in sorted(kwargs.keys()):
-                    v = kwargs[k]
-                    if hasattr(v, '__dict__'):
-                        continue  # Skip complex objects
-                    key_parts.append(f"{k}:{v}")
-                
-                cache_key = ":".join(key_parts)
+                # Default key builder hashes the serialized args and kwargs,
+                # skipping complex objects like request
+                raw = orjson.dumps(
+                    (
+                        prefix,
+                        func.__name__,
+                        [arg for arg in args if not hasattr(arg, '__dict__')],
+                        {k: v for k, v in kwargs.items() if not hasattr(v, '__dict__')},
+                    ),
+                    default=str,
+                    option=orjson.OPT_SORT_KEYS,
+                )
+                cache_key = f"{prefix}:{func.__name__}:{xxhash.xxh3_64_hexdigest(raw)}"
             
             # Try to get from cache
-            cached_data = RedisCache.get(cache_key)
+            cached_data = await RedisCache.get(cache_key)
             if cached_data is not None:
                 logger.debug(f"Cache hit: {cache_key}")
                 return cached_data
             
+            # Another request is already computing this key, share its result
+            inflight = _inflight.get(cache_key)
+            if inflight is not None:
+                logger.debug(f"Cache miss, awaiting in-flight call: {cache_key}")
+                try:
+                    return await asyncio.shield(inflight)
+                except asyncio.CancelledError:
+                    # The request running the function was cancelled, run it here instead
+                    if not inflight.cancelled():
+                        raise
+                    return await func(*args, **kwargs)
+            
             # Cache miss, execute function
             logger.debug(f"Cache miss: {cache_key}")
-            result = await func(*args, **kwargs)
+            future = asyncio.get_running_loop().create_future()
+            _inflight[cache_key] = future
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                future.set_exception(e)
+                # Mark the exception retrieved in case no other request was waiting
+                future.exception()
+                raise
+            except BaseException:
+                future.cancel()
+                raise
+            finally:
+                _inflight.pop(cache_key, None)
+            future.set_result(result)
             
-            # Store result in cache
-            RedisCache.set(cache_key, result, ttl)
+            # Store result in cache without delaying the response
+            RedisCache.set_in_background(cache_key, result, ttl, encoder)
             
             return result
         
@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from typing import Any, Dict, List, Optional
 
 from pydantic import Field, AnyHttpUrl, validator
@@ -19,6 +20,7 @@ class Settings(BaseSettings):
     
     # CORS settings
     CORS_ORIGINS: List[str] = ["*"]
+    CORS_MAX_AGE: int = Field(default=86400, description="Seconds browsers may cache CORS preflight responses")
     ALLOWED_HOSTS: List[str] = ["*"]
     
     # Supabase settings
@@ -27,8 +29,11 @@ class Settings(BaseSettings):
     SUPABASE_SERVICE_ROLE_KEY: Optional[str] = Field(None, description="Supabase service role key for admin operations")
     SUPABASE_STORAGE_BUCKET: str = Field(default="uploaded-files", description="Supabase storage bucket name")
     
+    # Server settings
+    WEB_CONCURRENCY: int = Field(default=1, ge=1, description="Number of server worker processes, also read by gunicorn and uvicorn")
+    
     # Rate limiting
-    RATE_LIMIT_PER_MINUTE: int = Field(default=100, description="Number of requests allowed per minute")
+    RATE_LIMIT_PER_MINUTE: int = Field(default=0, ge=0, description="Number of requests allowed per minute per client, or 0 for no limit")
     
     # File upload settings
     MAX_UPLOAD_SIZE: int = Field(default=10 * 1024 * 1024, description="Maximum upload size in bytes (10MB)")
@@ -46,6 +51,15 @@ class Settings(BaseSettings):
     REDIS_PASSWORD: Optional[str] = Field(default=None, description="Redis server password")
     REDIS_DB: int = Field(default=0, description="Redis database index")
     
+    # Document classifier settings
+    EMBED_MODEL: str = Field(default="sentence-transformers/all-MiniLM-L6-v2", description="Sentence-transformers model used to embed documents")
+    CLASSIFIER_BACKEND: str = Field(default="onnx", description="Embedding model backend: onnx (int8-quantized, CPU) or torch")
+    PRELOAD_CLASSIFIER: bool = Field(default=False, description="Load the classifier at startup so workers forked by gunicorn --preload share it")
+    CLASSIFIER_BF16: bool = Field(default=False, description="Run the PyTorch model under bfloat16 autocast (for CPUs with native bf16 support)")
+    
+    # Background worker settings
+    CELERY_BROKER_URL: Optional[str] = Field(default=None, description="Celery broker URL (defaults to Redis database 1 on REDIS_HOST)")
+    
     @validator("ENVIRONMENT")
     def validate_environment(cls, v):
         """Validate environment is one of the allowed values"""
@@ -54,6 +68,14 @@ class Settings(BaseSettings):
             raise ValueError(f"Environment must be one of {allowed}")
         return v
         
+    @validator("CLASSIFIER_BACKEND")
+    def validate_classifier_backend(cls, v):
+        """Validate the classifier backend is one of the supported values"""
+        allowed = {"onnx", "torch"}
+        if v not in allowed:
+            raise ValueError(f"Classifier backend must be one of {allowed}")
+        return v
+        
     @validator("CORS_ORIGINS", pre=True)
     def assemble_cors_origins(cls, v: str | List[str]) -> List[str]:
         if isinstance(v, str) and v != "":
@@ -65,8 +87,15 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=".env", 
         env_file_encoding="utf-8",
-        case_sensitive=True
+        case_sensitive=True,
+        frozen=True
     )
 
 
-settings = Settings() 
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Get the application settings, loaded once per process"""
+    return Settings()
+
+
+settings = get_settings() 
\ No newline at end of file
@@ -1,6 +1,6 @@
 from typing import Generator
 
-from app.db.supabase import supabase_client, get_supabase_client
+from app.db.supabase import get_supabase_client
 
 
 def get_db() -> Generator:
@@ -8,7 +8,7 @@ def get_db() -> Generator:
     Dependency for getting a Supabase client instance
     """
     try:
-        yield supabase_client
+        yield get_supabase_client()
     finally:
         # No cleanup needed for Supabase client
         pass 
\ No newline at end of file
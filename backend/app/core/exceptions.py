@@ -36,6 +36,16 @@ class DocumentNotFound(APIError):
         )
 
 
+class JobNotFound(APIError):
+    """Raised when a requested background job is not found or has expired"""
+    def __init__(self, job_id: str):
+        super().__init__(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job with ID {job_id} not found",
+            error_code="JOB_NOT_FOUND"
+        )
+
+
 class InvalidFileFormat(APIError):
     """Raised when an uploaded file has an invalid format"""
     def __init__(self, detail: str = "Invalid file format", error_code: str = "INVALID_FILE_FORMAT", details: dict = None):
@@ -0,0 +1,101 @@
+import logging
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from app.core.cache import RedisCache
+
+logger = logging.getLogger("api.jobs")
+
+# Job records expire after a day
+JOB_TTL_SECONDS = 86400
+
+# Fallback job storage when Redis is unavailable (only visible to this process)
+_local_jobs: Dict[str, Dict[str, Any]] = {}
+
+
+class JobStatus:
+    """Lifecycle states of a background job"""
+    PENDING = "pending"
+    PROCESSING = "processing"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class JobStore:
+    """Tracks the status of background jobs so clients can poll for results"""
+
+    @staticmethod
+    def _key(job_id: str) -> str:
+        return f"jobs:{job_id}"
+
+    @staticmethod
+    async def _save(job: Dict[str, Any]) -> None:
+        """Persist a job record to Redis, or to process memory if Redis is unavailable"""
+        job["updated_at"] = time.time()
+        if not await RedisCache.set(JobStore._key(job["job_id"]), job, JOB_TTL_SECONDS):
+            JobStore._cleanup(job["updated_at"])
+            _local_jobs[job["job_id"]] = job
+
+    @staticmethod
+    def _cleanup(current_time: float) -> None:
+        """Remove expired jobs from the in-process fallback storage"""
+        expired_time = current_time - JOB_TTL_SECONDS
+        expired_jobs = [
+            job_id
+            for job_id, job in _local_jobs.items()
+            if job["updated_at"] < expired_time
+        ]
+
+        for job_id in expired_jobs:
+            del _local_jobs[job_id]
+
+    @staticmethod
+    async def create(**metadata: Any) -> str:
+        """
+        Register a new pending job
+
+        Args:
+            metadata: Additional fields stored with the job (e.g. filename)
+
+        Returns:
+            The generated job ID
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": JobStatus.PENDING,
+            "created_at": time.time(),
+            "result": None,
+            "error": None,
+            **metadata
+        }
+        await JobStore._save(job)
+        return job_id
+
+    @staticmethod
+    async def get(job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job record by ID"""
+        job = await RedisCache.get(JobStore._key(job_id))
+        if job is None:
+            job = _local_jobs.get(job_id)
+        return job
+
+    @staticmethod
+    async def update(job_id: str, status: str, **fields: Any) -> None:
+        """
+        Update the status of a job along with any result or error fields
+
+        Args:
+            job_id: ID of the job to update
+            status: New job status
+            fields: Fields to set on the job record (e.g. result, error)
+        """
+        job = await JobStore.get(job_id)
+        if job is None:
+            logger.warning(f"Job {job_id} not found, recreating record")
+            job = {"job_id": job_id, "created_at": time.time(), "result": None, "error": None}
+
+        job["status"] = status
+        job.update(fields)
+        await JobStore._save(job)
@@ -1,23 +1,70 @@
 from fastapi import Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 import time
 import logging
 from typing import Callable, Dict, Any, Union
-import json
+import orjson
 
 from .exceptions import APIError, InvalidFileFormat
 from .rate_limiter import RateLimiter
 
 logger = logging.getLogger(__name__)
 
+FORWARDED_FOR_HEADER = b"x-forwarded-for"
+PROCESS_TIME_HEADER = b"x-process-time"
+
+# Headers that together mark a CORS preflight, which CORSMiddleware answers itself
+PREFLIGHT_HEADERS = frozenset((b"origin", b"access-control-request-method"))
+
+# Rejection response for rate-limited requests, built once apart from Retry-After
+RATE_LIMIT_BODY = orjson.dumps({
+    "status": "error",
+    "error": "RATE_LIMIT_EXCEEDED",
+    "message": "Too many requests. Please try again later."
+})
+RATE_LIMIT_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"content-length", str(len(RATE_LIMIT_BODY)).encode()),
+]
+
+CONTENT_LENGTH_HEADER = b"content-length"
+
+# Rejection response for request bodies over the size limit
+BODY_TOO_LARGE_BODY = orjson.dumps({
+    "status": "error",
+    "error": "REQUEST_TOO_LARGE",
+    "message": "Request body exceeds the maximum allowed size."
+})
+BODY_TOO_LARGE_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"content-length", str(len(BODY_TOO_LARGE_BODY)).encode()),
+    (b"connection", b"close"),
+]
+
+REQUEST_HEADERS_HEADER = b"access-control-request-headers"
+
+# Rejection response for preflights listing an oversized set of request headers
+PREFLIGHT_TOO_LARGE_BODY = orjson.dumps({
+    "status": "error",
+    "error": "PREFLIGHT_HEADERS_TOO_LARGE",
+    "message": "Access-Control-Request-Headers exceeds the maximum allowed size."
+})
+PREFLIGHT_TOO_LARGE_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"content-length", str(len(PREFLIGHT_TOO_LARGE_BODY)).encode()),
+]
+
 class TimingMiddleware:
     """
     Middleware to log request timing information and apply rate limiting
+    
+    GET requests under exempt_get_prefixes are not rate limited.
     """
-    def __init__(self, app, rate_limiter=None):
+    def __init__(self, app, rate_limiter=None, exempt_get_prefixes=()):
         self.app = app
         self.rate_limiter = rate_limiter
+        self.exempt_get_prefixes = tuple(exempt_get_prefixes)
     
     async def __call__(self, scope, receive, send):
         if scope["type"] != "http":
@@ -29,39 +76,28 @@ class TimingMiddleware:
         method = scope.get("method", "")
         
         # Check rate limit if rate limiter is provided
-        if self.rate_limiter and not self.rate_limiter.is_allowed(client_ip):
-            # Create a custom response for rate-limited requests
-            async def send_rate_limit_response(message):
-                if message["type"] == "http.response.start":
-                    headers = [(b"content-type", b"application/json")]
-                    await send({
-                        "type": "http.response.start",
-                        "status": 429,
-                        "headers": headers
-                    })
-                elif message["type"] == "http.response.body":
-                    body = json.dumps({
-                        "status": "error",
-                        "error": "RATE_LIMIT_EXCEEDED",
-                        "message": "Too many requests. Please try again later."
-                    }).encode()
-                    await send({
-                        "type": "http.response.body",
-                        "body": body,
-                        "more_body": False
-                    })
-            
-            await send_rate_limit_response({"type": "http.response.start"})
-            await send_rate_limit_response({"type": "http.response.body"})
-            return
+        if self.rate_limiter and not self.is_exempt(scope, method, path):
+            allowed, retry_after = await self.rate_limiter.check(client_ip)
+            if not allowed:
+                await self.send_rate_limited(send, retry_after)
+                return
         
-        # Wrap the send function to capture the status code
+        # Wrap the send function to capture the status code and report the time
+        # taken until the response starts, in seconds with fixed six decimals
         status_code = None
         
         async def wrapped_send(message):
             nonlocal status_code
             if message["type"] == "http.response.start":
                 status_code = message["status"]
+                # Copied rather than appended to, since header lists may be shared constants
+                message = {
+                    **message,
+                    "headers": [
+                        *message.get("headers", ()),
+                        (PROCESS_TIME_HEADER, f"{time.time() - start_time:.6f}".encode()),
+                    ],
+                }
             await send(message)
         
         # Process the request
@@ -90,16 +126,42 @@ class TimingMiddleware:
             # Re-raise the exception to be handled by the exception handlers
             raise
     
+    @staticmethod
+    async def send_rate_limited(send, retry_after: int):
+        """Send the 429 response, telling the client when its rate limit window resets"""
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": RATE_LIMIT_HEADERS + [(b"retry-after", str(retry_after).encode())]
+        })
+        await send({
+            "type": "http.response.body",
+            "body": RATE_LIMIT_BODY,
+            "more_body": False
+        })
+    
+    def is_exempt(self, scope, method: str, path: str) -> bool:
+        """
+        Check whether a request is exempt from rate limiting
+        
+        Preflights are answered by CORSMiddleware without reaching the app, so they aren't counted.
+        """
+        if method == "GET":
+            return path.startswith(self.exempt_get_prefixes)
+        return method == "OPTIONS" and self.is_preflight(scope)
+    
+    @staticmethod
+    def is_preflight(scope) -> bool:
+        """Check whether an OPTIONS request carries the headers of a CORS preflight"""
+        found = {name for name, _ in scope.get("headers", ()) if name in PREFLIGHT_HEADERS}
+        return len(found) == len(PREFLIGHT_HEADERS)
+    
     def get_client_ip(self, scope):
         """Extract client IP from scope, considering forwarded headers"""
-        headers = {
-            header[0].decode('utf-8').lower(): header[1].decode('utf-8')
-            for header in scope.get("headers", [])
-        }
-        
-        # Try to get IP from headers
-        if "x-forwarded-for" in headers:
-            return headers["x-forwarded-for"].split(",")[0].strip()
+        # ASGI header names are already lowercased bytes, so only the matching value is decoded
+        for name, value in scope.get("headers", ()):
+            if name == FORWARDED_FOR_HEADER:
+                return value.split(b",", 1)[0].strip().decode("latin-1")
             
         # Fallback to client address from ASGI scope
         client = scope.get("client")
@@ -109,11 +171,88 @@ class TimingMiddleware:
         return "unknown"
 
 
-async def api_error_handler(request: Request, exc: APIError) -> JSONResponse:
+class BodySizeLimitMiddleware:
+    """
+    Middleware rejecting requests whose declared Content-Length is over a limit
+    
+    The check runs before the body is received, so oversized uploads are
+    answered with 413 without being transferred or parsed. Clients sending
+    "Expect: 100-continue" never transmit the body, since the server only
+    sends "100 Continue" once the application starts reading it. Bodies
+    without a Content-Length are left to the endpoints' own size checks.
+    """
+    def __init__(self, app, max_body_size: int):
+        self.app = app
+        self.max_body_size = max_body_size
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            for name, value in scope.get("headers", ()):
+                if name == CONTENT_LENGTH_HEADER:
+                    if value.isdigit() and int(value) > self.max_body_size:
+                        await self.send_too_large(send)
+                        return
+                    break
+        
+        await self.app(scope, receive, send)
+    
+    @staticmethod
+    async def send_too_large(send):
+        """Send the 413 response and close the connection, leaving the body unread"""
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": BODY_TOO_LARGE_HEADERS
+        })
+        await send({
+            "type": "http.response.body",
+            "body": BODY_TOO_LARGE_BODY,
+            "more_body": False
+        })
+
+
+class PreflightLimitMiddleware:
+    """
+    Middleware rejecting CORS preflights with an oversized Access-Control-Request-Headers
+    
+    CORSMiddleware splits and echoes the requested header list, so a huge
+    list (e.g. megabytes of commas) costs time and memory on every preflight.
+    Mounted in front of CORSMiddleware, this answers such preflights with 400
+    before they are parsed. Real browsers send at most a few hundred bytes.
+    """
+    def __init__(self, app, max_request_headers_size: int = 8192):
+        self.app = app
+        self.max_request_headers_size = max_request_headers_size
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope.get("method") == "OPTIONS":
+            for name, value in scope.get("headers", ()):
+                if name == REQUEST_HEADERS_HEADER and len(value) > self.max_request_headers_size:
+                    await self.send_too_large(send)
+                    return
+        
+        await self.app(scope, receive, send)
+    
+    @staticmethod
+    async def send_too_large(send):
+        """Send the 400 response for an oversized preflight"""
+        await send({
+            "type": "http.response.start",
+            "status": 400,
+            "headers": PREFLIGHT_TOO_LARGE_HEADERS
+        })
+        await send({
+            "type": "http.response.body",
+            "body": PREFLIGHT_TOO_LARGE_BODY,
+            "more_body": False
+        })
+
+
+async def api_error_handler(request: Request, exc: APIError) -> ORJSONResponse:
     """
     Handler for custom API errors
     """
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "error": exc.error_code,
@@ -122,13 +261,13 @@ async def api_error_handler(request: Request, exc: APIError) -> JSONResponse:
     )
 
 
-async def general_exception_handler(request: Request, exc: Exception) -> JSONResponse:
+async def general_exception_handler(request: Request, exc: Exception) -> ORJSONResponse:
     """
     Handler for all other unhandled exceptions
     """
     logger.exception(f"Unhandled exception occurred: {str(exc)}")
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={
             "error": "INTERNAL_SERVER_ERROR",
@@ -136,7 +275,7 @@ async def general_exception_handler(request: Request, exc: Exception) -> JSONRes
         }
     )
 
-async def invalid_file_format_handler(request: Request, exc: InvalidFileFormat) -> JSONResponse:
+async def invalid_file_format_handler(request: Request, exc: InvalidFileFormat) -> ORJSONResponse:
     """
     Special handler for file format validation errors to provide better debugging information
     """
@@ -169,7 +308,7 @@ async def invalid_file_format_handler(request: Request, exc: InvalidFileFormat)
             logger.warning(f"Could not extract file details from request: {str(e)}")
     
     # Return the standard error response
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "error": exc.error_code,
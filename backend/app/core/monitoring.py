@@ -1,6 +1,6 @@
 import time
 import logging
-import json
+import orjson
 import functools
 from fastapi import Request, Response
 from typing import Callable, Dict, Any, Optional, Union
@@ -13,12 +13,46 @@ except ImportError:
 
 logger = logging.getLogger("api.performance")
 
+# System metrics are sampled at most this often, whatever the request rate
+METRICS_TTL_SECONDS = 1.0
+DISK_METRICS_TTL_SECONDS = 10.0
+
+_metrics_cache: Dict[str, Any] = {"sampled_at": float("-inf"), "metrics": {}}
+_disk_metrics_cache: Dict[str, Any] = {"sampled_at": float("-inf"), "disk_used_percent": None}
+
+
+class MetricsFormatter(logging.Formatter):
+    """
+    Log formatter that appends a record's structured metrics as JSON
+    
+    Metrics are passed with extra={"metrics": ...} and only serialized
+    when a handler actually outputs the record.
+    """
+    
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        metrics = getattr(record, "metrics", None)
+        if metrics is not None:
+            message = f"{message}: {orjson.dumps(metrics, default=str).decode()}"
+        return message
+
+
 class PerformanceMonitor:
     """Performance monitoring utilities for API endpoints"""
     
     @staticmethod
     def get_system_metrics() -> Dict[str, float]:
-        """Get current system performance metrics"""
+        """
+        Get current system performance metrics
+        
+        Samples are cached for METRICS_TTL_SECONDS (disk usage for
+        DISK_METRICS_TTL_SECONDS), so psutil is queried at most once per
+        interval however many requests are monitored.
+        """
+        now = time.monotonic()
+        if now - _metrics_cache["sampled_at"] < METRICS_TTL_SECONDS:
+            return dict(_metrics_cache["metrics"])
+        
         metrics = {}
         
         if PSUTIL_AVAILABLE:
@@ -28,9 +62,11 @@ class PerformanceMonitor:
                 metrics["memory_used_percent"] = memory.percent
                 metrics["memory_available_mb"] = memory.available / (1024 * 1024)
                 
-                # Disk usage for the main filesystem
-                disk = psutil.disk_usage("/")
-                metrics["disk_used_percent"] = disk.percent
+                # Disk usage for the main filesystem changes slowly, so it is sampled less often
+                if now - _disk_metrics_cache["sampled_at"] >= DISK_METRICS_TTL_SECONDS:
+                    _disk_metrics_cache["disk_used_percent"] = psutil.disk_usage("/").percent
+                    _disk_metrics_cache["sampled_at"] = now
+                metrics["disk_used_percent"] = _disk_metrics_cache["disk_used_percent"]
                 
                 # Network I/O since last call (first call will be zeros)
                 net_io = psutil.net_io_counters()
@@ -39,7 +75,9 @@ class PerformanceMonitor:
             except Exception as e:
                 logger.warning(f"Error collecting system metrics: {str(e)}")
         
-        return metrics
+        _metrics_cache["metrics"] = metrics
+        _metrics_cache["sampled_at"] = now
+        return dict(metrics)
     
     @staticmethod
     def log_request_metrics(
@@ -49,6 +87,10 @@ class PerformanceMonitor:
         extra: Optional[Dict[str, Any]] = None
     ) -> None:
         """Log detailed request performance metrics"""
+        # Skip building metrics (and sampling psutil) when they would be discarded
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        
         try:
             metrics = {
                 "path": request.url.path,
@@ -69,8 +111,8 @@ class PerformanceMonitor:
             if extra:
                 metrics.update(extra)
                 
-            # Log as structured JSON for easier parsing by monitoring tools
-            logger.info(f"Request metrics: {json.dumps(metrics)}")
+            # Log as structured data, serialized to JSON by MetricsFormatter for monitoring tools
+            logger.info("Request metrics", extra={"metrics": metrics})
         except Exception as e:
             logger.error(f"Error logging performance metrics: {str(e)}")
     
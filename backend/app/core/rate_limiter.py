@@ -1,17 +1,36 @@
 import time
-from typing import Dict, Tuple
+from collections import OrderedDict
+from typing import Tuple
 import logging
 
+from app.core import cache
+
 logger = logging.getLogger(__name__)
 
+# Fixed-window counter: the first request in a window starts its expiry,
+# and requests beyond the limit are rejected until the key expires.
+# Returns {allowed, milliseconds until the window resets}.
+RATE_LIMIT_SCRIPT = """
+local count = redis.call('INCR', KEYS[1])
+if count == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return {count > tonumber(ARGV[1]) and 0 or 1, redis.call('PTTL', KEYS[1])}
+"""
+
 class RateLimiter:
     """
-    A simple in-memory rate limiter for API requests.
+    A Redis-backed rate limiter for API requests, shared by all workers.
+    
+    Request counts live in Redis keys that expire with their time window, so
+    no cleanup is needed. When Redis is unavailable, requests are counted in
+    process memory instead.
     
     Attributes:
-        rate (int): The maximum number of requests allowed per time period.
+        rate (int): The maximum number of requests allowed per time period, or 0 to allow all requests.
         per (int): The time period in seconds.
-        clients (Dict[str, Tuple[int, float]]): Dictionary tracking client requests.
+        clients (OrderedDict[str, Tuple[int, int]]): In-memory fallback counts and window start times in
+            monotonic nanoseconds, ordered from the oldest window to the newest.
     """
     
     def __init__(self, rate: int = 100, per: int = 60):
@@ -19,15 +38,21 @@ class RateLimiter:
         Initialize a rate limiter.
         
         Args:
-            rate: Maximum number of requests allowed per time period
+            rate: Maximum number of requests allowed per time period, or 0 for no limit
             per: Time period in seconds
         """
         self.rate = rate
         self.per = per
-        self.clients: Dict[str, Tuple[int, float]] = {}
-        logger.info(f"Rate limiter initialized: {rate} requests per {per} seconds")
+        self.per_ns = per * 1_000_000_000
+        self.clients: "OrderedDict[str, Tuple[int, int]]" = OrderedDict()
+        self._script = None
+        self._script_client = None
+        if rate > 0:
+            logger.info(f"Rate limiter initialized: {rate} requests per {per} seconds")
+        else:
+            logger.info("Rate limiter initialized: no limit")
         
-    def is_allowed(self, client_id: str) -> bool:
+    async def is_allowed(self, client_id: str) -> bool:
         """
         Check if a client is allowed to make a request.
         
@@ -37,7 +62,58 @@ class RateLimiter:
         Returns:
             bool: True if the request is allowed, False otherwise
         """
-        current_time = time.time()
+        allowed, _ = await self.check(client_id)
+        return allowed
+    
+    async def check(self, client_id: str) -> Tuple[bool, int]:
+        """
+        Check if a client is allowed to make a request, and when its window resets.
+        
+        Args:
+            client_id: Unique identifier for the client (e.g., IP address)
+            
+        Returns:
+            Tuple[bool, int]: Whether the request is allowed, and the whole seconds
+            until the client's current window resets (for Retry-After)
+        """
+        if self.rate <= 0:
+            return True, self.per
+        
+        redis_client = cache.redis_client
+        if not redis_client:
+            return self._check_local(client_id)
+            
+        # The script is registered per client, since the cache may disable its client at startup
+        if self._script_client is not redis_client:
+            self._script = redis_client.register_script(RATE_LIMIT_SCRIPT)
+            self._script_client = redis_client
+            
+        try:
+            allowed, ttl_ms = await self._script(keys=[f"ratelimit:{client_id}"], args=[self.rate, self.per])
+        except Exception as e:
+            logger.error(f"Rate limiter error: {str(e)}")
+            return self._check_local(client_id)
+            
+        # A key without an expiry (PTTL -1) is treated as a fresh window
+        if ttl_ms < 0:
+            ttl_ms = self.per * 1000
+        return bool(allowed), max(1, -(-ttl_ms // 1000))
+    
+    def _check_local(self, client_id: str) -> Tuple[bool, int]:
+        """
+        Check a client against the in-memory fallback counts.
+        
+        Window start times come from the monotonic clock in integer nanoseconds,
+        so clock adjustments can't shorten or extend a window.
+        
+        Args:
+            client_id: Unique identifier for the client (e.g., IP address)
+            
+        Returns:
+            Tuple[bool, int]: Whether the request is allowed, and the whole seconds
+            until the client's current window resets
+        """
+        current_time = time.monotonic_ns()
         
         # Remove expired entries (older than 'per' seconds)
         self._cleanup(current_time)
@@ -47,35 +123,36 @@ class RateLimiter:
             count, timestamp = self.clients[client_id]
             
             # If within the current time window
-            if current_time - timestamp < self.per:
+            if current_time - timestamp < self.per_ns:
+                retry_after = max(1, -(-(timestamp + self.per_ns - current_time) // 1_000_000_000))
                 # If exceeded rate limit
                 if count >= self.rate:
-                    return False
+                    return False, retry_after
                 # Increment request count
                 self.clients[client_id] = (count + 1, timestamp)
-            else:
-                # Start a new time window
-                self.clients[client_id] = (1, current_time)
+                return True, retry_after
+            
+            # Start a new time window, keeping the clients ordered by window start
+            self.clients[client_id] = (1, current_time)
+            self.clients.move_to_end(client_id)
         else:
             # First request from this client
             self.clients[client_id] = (1, current_time)
             
-        return True
+        return True, self.per
     
-    def _cleanup(self, current_time: float) -> None:
+    def _cleanup(self, current_time: int) -> None:
         """
         Remove expired entries from the clients dictionary.
         
         Args:
-            current_time: Current timestamp
+            current_time: Current monotonic time in nanoseconds
         """
-        # This prevents the clients dictionary from growing indefinitely
-        expired_time = current_time - self.per
-        expired_clients = [
-            client_id 
-            for client_id, (_, timestamp) in self.clients.items() 
-            if timestamp < expired_time
-        ]
-        
-        for client_id in expired_clients:
-            del self.clients[client_id] 
\ No newline at end of file
+        # This prevents the clients dictionary from growing indefinitely. Clients are
+        # ordered by window start, so only the expired entries at the front are visited.
+        expired_time = current_time - self.per_ns
+        while self.clients:
+            _, timestamp = next(iter(self.clients.values()))
+            if timestamp >= expired_time:
+                break
+            self.clients.popitem(last=False)
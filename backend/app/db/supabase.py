@@ -1,18 +1,40 @@
-from supabase import create_client, Client
+from functools import lru_cache
+from typing import Optional
+
+import httpx
+from supabase import create_client, Client, ClientOptions
 
 from app.core.config import settings
 
+# Connections to Supabase (PostgREST, Storage) are pooled and kept alive between
+# requests, so database and storage calls skip the TCP and TLS handshakes
+SUPABASE_HTTP_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20)
+SUPABASE_HTTP_TIMEOUT = 30.0
+
+_http_client: Optional[httpx.Client] = None
+
 
+@lru_cache(maxsize=1)
 def get_supabase_client() -> Client:
     """
-    Creates and returns a Supabase client instance using service role key
-    for bypassing Row Level Security policies
+    Returns the shared Supabase client instance using service role key
+    for bypassing Row Level Security policies, creating it on first use
     """
+    global _http_client
+    _http_client = httpx.Client(limits=SUPABASE_HTTP_LIMITS, timeout=SUPABASE_HTTP_TIMEOUT)
     return create_client(
         supabase_url=settings.SUPABASE_URL,
-        supabase_key=settings.SUPABASE_SERVICE_ROLE_KEY
+        supabase_key=settings.SUPABASE_SERVICE_ROLE_KEY,
+        options=ClientOptions(httpx_client=_http_client)
     )
 
 
-# Initialize the Supabase client for global use
-supabase_client = get_supabase_client() 
\ No newline at end of file
+def close_supabase_client() -> None:
+    """
+    Closes the shared Supabase client's pooled connections, if it was created
+    """
+    global _http_client
+    if _http_client is not None:
+        _http_client.close()
+        _http_client = None
+        get_supabase_client.cache_clear()
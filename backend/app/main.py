@@ -1,23 +1,86 @@
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+import os
 import time
+import atexit
+from contextlib import asynccontextmanager
 import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
 from app.api.api import api_router
+from app.core.cache import init_redis, close_redis
 from app.core.config import settings
+from app.db.supabase import close_supabase_client
 from app.core.exceptions import APIError, InvalidFileFormat
-from app.core.middleware import TimingMiddleware, api_error_handler, general_exception_handler, invalid_file_format_handler
+from app.core.rate_limiter import RateLimiter
+from app.core.middleware import BodySizeLimitMiddleware, PreflightLimitMiddleware, TimingMiddleware, api_error_handler, general_exception_handler, invalid_file_format_handler
+from app.core.monitoring import MetricsFormatter
+from app.services.document_processor import DocumentProcessor
 
-# Configure logging
+# Configure logging. Records are queued and written by a listener thread,
+# so request handlers never block on log output.
+log_queue = queue.SimpleQueue()
+log_stream_handler = logging.StreamHandler()
+log_stream_handler.setFormatter(
+    MetricsFormatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s')
+)
+log_listener = QueueListener(log_queue, log_stream_handler, respect_handler_level=True)
+log_queue_handler = QueueHandler(log_queue)
+log_queue_handler.setFormatter(logging.Formatter('%(message)s'))  # Formatted by the listener
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(name)s: %(message)s',
+    handlers=[log_queue_handler],
 )
+log_listener.start()
+
+
+def restart_log_listener() -> None:
+    """Start a new listener thread, as after a fork since threads don't survive it"""
+    global log_listener
+    log_listener = QueueListener(log_queue, log_stream_handler, respect_handler_level=True)
+    log_listener.start()
+
+
+def stop_log_listener() -> None:
+    """Flush queued records and stop this process's listener thread, if it is running"""
+    # QueueListener.stop() fails if the listener was already stopped, e.g. by
+    # a fork after the atexit handler ran
+    if log_listener._thread is not None:
+        log_listener.stop()
+
+
+# Flush the queue before forking (e.g. gunicorn --preload workers), so queued
+# records aren't copied into and written again by every child process
+os.register_at_fork(
+    before=stop_log_listener,
+    after_in_parent=restart_log_listener,
+    after_in_child=restart_log_listener,
+)
+atexit.register(stop_log_listener)
 
 logger = logging.getLogger(__name__)
 
+# Optionally load the classifier now, before a preloading server (gunicorn --preload)
+# forks its workers, so they share the model weights copy-on-write instead of each
+# loading a copy. The classifier then runs inference on one thread per worker.
+if settings.PRELOAD_CLASSIFIER:
+    from app.api.routes.files import get_document_classifier
+    
+    get_document_classifier()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared connections on startup and close them on shutdown"""
+    await init_redis()
+    yield
+    await close_redis()
+    close_supabase_client()
+
+
 # Create the FastAPI app with metadata
 app = FastAPI(
     title="Document Classification API",
@@ -36,6 +99,14 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/api/docs" if settings.ENVIRONMENT != "production" else None,
     redoc_url="/api/redoc" if settings.ENVIRONMENT != "production" else None,
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
+
+# Reject request bodies larger than any upload before they are received
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_body_size=DocumentProcessor.MAX_UPLOAD_REQUEST_SIZE
 )
 
 # Add middleware for CORS with proper configuration
@@ -45,20 +116,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=settings.CORS_MAX_AGE,
 )
 
-# Create a simple rate limiter class in case the original is not available
-class SimpleRateLimiter:
-    def __init__(self, rate=100, per=60):
-        self.rate = rate
-        self.per = per
-        self.tokens = {}
-        
-    def is_allowed(self, key):
-        return True  # Simple implementation allows all requests
+# Reject preflights with oversized header lists before CORSMiddleware parses them
+app.add_middleware(PreflightLimitMiddleware)
 
-# Add timing middleware with a simple rate limiter
-app.add_middleware(TimingMiddleware, rate_limiter=SimpleRateLimiter())
+# Add timing middleware with a Redis-backed rate limiter shared across workers,
+# enforced only when RATE_LIMIT_PER_MINUTE is set. Upload job status is polled
+# while files are processed, so those reads aren't limited.
+app.add_middleware(
+    TimingMiddleware,
+    rate_limiter=RateLimiter(rate=settings.RATE_LIMIT_PER_MINUTE, per=60),
+    exempt_get_prefixes=("/api/v1/jobs/",)
+)
 
 # Add trusted host middleware
 app.add_middleware(
@@ -86,7 +157,7 @@ async def health_check():
         "environment": settings.ENVIRONMENT
     }
 
-@app.get("/", include_in_schema=False)
+@app.api_route("/", methods=["GET", "HEAD"], include_in_schema=False)
 async def root():
     """
     Root endpoint that redirects to the API documentation
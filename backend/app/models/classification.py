@@ -0,0 +1,6 @@
+from pydantic import BaseModel, Field
+
+
+class ClassificationRequest(BaseModel):
+    """Model for classifying text without uploading a file"""
+    text: str = Field(..., min_length=1, description="Document text to classify")
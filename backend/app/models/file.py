@@ -1,5 +1,5 @@
 from typing import Optional, Dict, Any, List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import datetime
 
 
@@ -26,8 +26,7 @@ class File(FileBase):
     content_hash: Optional[str] = None
     category_prediction: Optional[Dict[str, Any]] = Field(default=None, description="JSON prediction data for file categories")
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 
 class PaginationInfo(BaseModel):
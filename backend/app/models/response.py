@@ -1,10 +1,9 @@
 from typing import Optional, Dict, Any, TypeVar, Generic
 from pydantic import BaseModel, Field
-from pydantic.generics import GenericModel
 
 T = TypeVar('T')
 
-class ApiResponse(GenericModel, Generic[T]):
+class ApiResponse(BaseModel, Generic[T]):
     """Generic API response model that can be used for any data type"""
     status: str = Field(..., description="Response status: success or error")
     message: Optional[str] = Field(None, description="Optional message about the operation")
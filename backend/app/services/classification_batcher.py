@@ -0,0 +1,96 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ClassificationBatcher:
+    """
+    Coalesces concurrent classification requests into batched model calls.
+    
+    Requests arriving within max_wait seconds of the first queued request are
+    classified together (up to max_batch texts) with one classify_batch call,
+    and each caller receives its own result.
+    
+    Attributes:
+        max_batch (int): Maximum number of texts classified in one call.
+        max_wait (float): Time in seconds to wait for more requests after the first.
+    """
+    
+    def __init__(self, classifier_factory: Callable[[], Any], max_batch: int = 16, max_wait: float = 0.02):
+        """
+        Initialize a classification batcher.
+        
+        Args:
+            classifier_factory: Callable returning an object with a classify_batch method
+            max_batch: Maximum number of texts classified in one call
+            max_wait: Time in seconds to wait for more requests after the first
+        """
+        self.classifier_factory = classifier_factory
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    async def submit(self, text: str) -> Dict[str, float]:
+        """
+        Queue a text for classification and wait for its result.
+        
+        Args:
+            text: The document text to classify
+            
+        Returns:
+            Dictionary mapping category names to confidence scores
+        """
+        loop = asyncio.get_running_loop()
+        
+        # Start a worker for this event loop if none is running
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+        
+        future = loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+    
+    async def _collect_batch(self) -> List[Tuple[str, asyncio.Future]]:
+        """Wait for a request, then gather more until the batch is full or max_wait passes"""
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        
+        while len(batch) < self.max_batch:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+                
+        return batch
+    
+    def _classify(self, texts: List[str]) -> List[Dict[str, float]]:
+        return self.classifier_factory().classify_batch(texts)
+    
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect_batch()
+            texts = [text for text, _ in batch]
+            
+            try:
+                # Model inference is CPU-bound, keep it off the event loop
+                results = await asyncio.to_thread(self._classify, texts)
+            except Exception as e:
+                logger.error(f"Batch classification of {len(texts)} documents failed: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            logger.debug(f"Classified batch of {len(texts)} documents")
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
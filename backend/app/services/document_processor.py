@@ -1,14 +1,50 @@
 import io
 import logging
-from typing import Tuple, Optional, Dict, Any
+import multiprocessing
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Callable, Tuple, Optional, Dict, Any, List
 import PyPDF2
 import docx
+from docx.oxml.ns import qn
 import os
+import xxhash
+from app.core.config import settings
 from app.core.exceptions import InvalidFileFormat
 
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Recent extraction results, keyed by content hash, content type and file
+# extension, least recently used first
+_extraction_cache: "OrderedDict[Tuple[str, str, str], Tuple[str, Optional[str]]]" = OrderedDict()
+_extraction_cache_lock = threading.Lock()
+
+# PDFium isn't thread-safe, so in-process calls into it (opening a document,
+# reading its pages, closing it) are serialized. Pool workers are separate
+# processes with one PDFium each and don't take the lock.
+_pdfium_lock = threading.Lock()
+
+# Runs of readable ASCII text, scanned for in PDFs that can't be parsed. The
+# pattern is a single character class, so matching never backtracks.
+PDF_TEXT_PATTERN = re.compile(rb'[a-zA-Z0-9 .,;:!?\'"\-+=/\\()\[\]{}]{4,}')
+
+# WordprocessingML elements read when extracting DOCX text straight from the XML
+DOCX_PARAGRAPH_TAG = qn("w:p")
+DOCX_RUN_TAG = qn("w:r")
+DOCX_TEXT_TAG = qn("w:t")
+DOCX_TAB_TAG = qn("w:tab")
+DOCX_BREAK_TAG = qn("w:br")
+
 class DocumentProcessingError(Exception):
     """Base class for document processing errors"""
     def __init__(self, message: str, details: Dict[str, Any] = None):
@@ -32,12 +68,117 @@ class CorruptedFileError(DocumentProcessingError):
     """Raised when file is corrupted and cannot be processed"""
     pass
 
+def read_pdf_page_text(pdf: "pdfium.PdfDocument", index: int) -> str:
+    """
+    Extract the text of one page of an open PDF, or "" if the page can't be read
+    
+    Callers in the server process must hold _pdfium_lock.
+    """
+    try:
+        page = pdf[index]
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_range()
+        finally:
+            textpage.close()
+            page.close()
+    except pdfium.PdfiumError as page_err:
+        logger.warning(f"Error extracting text from page {index+1}: {str(page_err)}")
+        return ""
+
+
+def read_docx_body_text(body) -> str:
+    """
+    Extract the text of a DOCX body in a single walk of its XML tree
+    
+    Paragraphs, including those in table cells, are put on separate lines.
+    Skips building python-docx's paragraph, table, row and cell wrappers.
+    """
+    parts = []
+    for node in body.iter(DOCX_PARAGRAPH_TAG, DOCX_TEXT_TAG, DOCX_TAB_TAG, DOCX_BREAK_TAG):
+        tag = node.tag
+        if tag == DOCX_TEXT_TAG:
+            if node.text:
+                parts.append(node.text)
+        elif tag == DOCX_PARAGRAPH_TAG:
+            parts.append("\n")
+        # Tab stop definitions in paragraph properties share the w:tab tag
+        elif node.getparent().tag == DOCX_RUN_TAG:
+            parts.append("\t" if tag == DOCX_TAB_TAG else "\n")
+    # Every paragraph starts with a newline, including the first
+    return "".join(parts)[1:]
+
+
+def extract_pdf_page_range(file_content: bytes, start: int, stop: int) -> List[str]:
+    """
+    Extract the text of pages start to stop of a PDF
+    
+    Runs in the PDF worker processes; each call opens its own copy of the
+    document since PDFium handles can't be shared between processes.
+    """
+    pdf = pdfium.PdfDocument(file_content)
+    try:
+        return [read_pdf_page_text(pdf, i) for i in range(start, stop)]
+    finally:
+        pdf.close()
+
+
+def pdf_worker_count() -> int:
+    """Number of PDF worker processes, splitting the CPUs between the server's worker processes"""
+    return max(1, (os.cpu_count() or 1) // settings.WEB_CONCURRENCY)
+
+
+@lru_cache(maxsize=1)
+def pdf_process_pool() -> ProcessPoolExecutor:
+    """
+    Process pool for extracting the pages of large PDFs in parallel
+    
+    Created on first use, so each server worker gets its own pool after
+    forking. Workers are spawned rather than forked from this multi-threaded process.
+    """
+    return ProcessPoolExecutor(
+        max_workers=pdf_worker_count(),
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+
 class DocumentProcessor:
     """Service for processing document files (text extraction, etc.)"""
     
     # Maximum file size in bytes (10MB)
     MAX_FILE_SIZE = 10 * 1024 * 1024
     
+    # Largest request body accepted for an upload: the file plus room for the
+    # multipart boundaries and part headers around it
+    MAX_UPLOAD_REQUEST_SIZE = MAX_FILE_SIZE + 64 * 1024
+    
+    # Chunk size used when streaming uploads (1MB)
+    STREAM_CHUNK_SIZE = 1024 * 1024
+    
+    # Number of leading bytes hashed for the cheap duplicate pre-check
+    PREFIX_HASH_SIZE = 4096
+    
+    # PDFs with at least this many pages are extracted across the PDF process
+    # pool. PDFium reads a page in milliseconds, so smaller documents are
+    # faster to extract here than to send to other processes.
+    PARALLEL_PDF_MIN_PAGES = 64
+    
+    # PDFs whose text extraction fails on more than half of this many leading
+    # pages are handled as corrupted instead of attempting the remaining pages
+    PDF_PAGE_FAILURE_SAMPLE = 20
+    
+    # Readers accept a "%PDF-" header anywhere in the first 1024 bytes
+    PDF_HEADER_SEARCH_SIZE = 1024
+    
+    # Major version digits accepted after the "%PDF-" header (PDF 1.x and 2.0).
+    # Kept as separate one-byte strings so a truncated header (empty slice) doesn't match.
+    PDF_MAJOR_VERSIONS = (b"1", b"2")
+    
+    # Number of extraction results kept in memory, and the largest file whose
+    # result is cached, which bounds the memory the cache can hold
+    EXTRACTION_CACHE_SIZE = 256
+    EXTRACTION_CACHE_MAX_FILE_SIZE = 1024 * 1024
+    
     # Supported content types
     SUPPORTED_CONTENT_TYPES = {
         "text/plain": [".txt"],
@@ -46,8 +187,78 @@ class DocumentProcessor:
         "application/msword": [".doc"]
     }
     
+    # Lookups derived from SUPPORTED_CONTENT_TYPES once, for per-upload validation
+    EXTENSIONS_BY_CONTENT_TYPE = {
+        content_type: frozenset(extensions)
+        for content_type, extensions in SUPPORTED_CONTENT_TYPES.items()
+    }
+    SUPPORTED_CONTENT_TYPES_STR = ", ".join(SUPPORTED_CONTENT_TYPES)
+    ALLOWED_FILE_TYPES = frozenset(
+        (content_type, extension)
+        for content_type, extensions in SUPPORTED_CONTENT_TYPES.items()
+        for extension in extensions
+    )
+    
+    @staticmethod
+    def content_hasher() -> "xxhash.xxh3_128":
+        """
+        Create an incremental hasher for the content hash used for duplicate detection
+        
+        xxh128 is used instead of a cryptographic hash since the value only
+        identifies identical uploads and never guards integrity.
+        
+        Returns:
+            Hasher object accepting update() calls for streamed chunks
+        """
+        return xxhash.xxh128()
+    
+    @staticmethod
+    def compute_content_hash(file_content: bytes) -> str:
+        """
+        Compute the content hash used for duplicate detection
+        
+        Args:
+            file_content: Raw bytes of the file
+            
+        Returns:
+            128-bit hex digest of the file content
+        """
+        hasher = DocumentProcessor.content_hasher()
+        hasher.update(file_content)
+        return hasher.hexdigest()
+    
     @staticmethod
-    def diagnose_pdf(file_content: bytes, filename: str = "") -> dict:
+    def compute_prefix_hash(file_content: bytes) -> str:
+        """
+        Compute a hash over the first PREFIX_HASH_SIZE bytes of the file
+        
+        Used together with the file size to rule out most non-duplicates
+        before comparing full content hashes.
+        
+        Args:
+            file_content: Raw bytes of the file
+            
+        Returns:
+            64-bit hex digest of the file prefix
+        """
+        # Hash a view of the prefix, so the leading bytes aren't copied out first
+        return xxhash.xxh64(memoryview(file_content)[:DocumentProcessor.PREFIX_HASH_SIZE]).hexdigest()
+    
+    @staticmethod
+    def find_pdf_header(file_content: bytes) -> int:
+        """
+        Find the %PDF- header of a supported PDF version
+        
+        Returns:
+            Offset of the header within the first PDF_HEADER_SEARCH_SIZE bytes, or -1 if there is none
+        """
+        header_at = file_content.find(b"%PDF-", 0, DocumentProcessor.PDF_HEADER_SEARCH_SIZE)
+        if header_at < 0 or file_content[header_at + 5:header_at + 6] not in DocumentProcessor.PDF_MAJOR_VERSIONS:
+            return -1
+        return header_at
+    
+    @staticmethod
+    def diagnose_pdf(file_content: bytes, filename: str = "", verbose: bool = True) -> dict:
         """
         Debug function to diagnose issues with PDF files
         
@@ -59,6 +270,8 @@ class DocumentProcessor:
         Args:
             file_content: Raw bytes of the PDF file
             filename: Original filename 
+            verbose: Also parse the PDF with PyPDF2 and read its first page, which
+                costs a full parse of the file; otherwise only the header is checked
             
         Returns:
             Dictionary with diagnostic information
@@ -71,14 +284,17 @@ class DocumentProcessor:
         
         # Check 1: PDF header
         try:
-            has_pdf_header = file_content.startswith(b'%PDF-')
-            diagnostic["checks"]["has_pdf_header"] = has_pdf_header
-            if has_pdf_header:
-                pdf_version = file_content[5:8].decode('ascii', errors='ignore')
+            header_at = DocumentProcessor.find_pdf_header(file_content)
+            diagnostic["checks"]["has_pdf_header"] = header_at >= 0
+            if header_at >= 0:
+                pdf_version = file_content[header_at + 5:header_at + 8].decode('ascii', errors='ignore')
                 diagnostic["checks"]["pdf_version"] = pdf_version
         except Exception as e:
             diagnostic["checks"]["header_error"] = str(e)
         
+        if not verbose:
+            return diagnostic
+        
         # Check 2: Try reading with PyPDF2
         try:
             with io.BytesIO(file_content) as pdf_file:
@@ -128,12 +344,18 @@ class DocumentProcessor:
             UnsupportedFileTypeError: If file extension doesn't match content type
         """
         # Check file size
-        if len(file_content) > DocumentProcessor.MAX_FILE_SIZE:
+        file_size = len(file_content)
+        if file_size > DocumentProcessor.MAX_FILE_SIZE:
             raise DocumentProcessingError(
                 f"File size exceeds maximum allowed size of {DocumentProcessor.MAX_FILE_SIZE / 1024 / 1024}MB",
-                {"max_size_bytes": DocumentProcessor.MAX_FILE_SIZE, "actual_size_bytes": len(file_content)}
+                {"max_size_bytes": DocumentProcessor.MAX_FILE_SIZE, "actual_size_bytes": file_size}
             )
         
+        # Supported files pass with a single lookup of their (content type, extension) pair
+        _, file_ext = os.path.splitext(filename.lower())
+        if (content_type, file_ext) in DocumentProcessor.ALLOWED_FILE_TYPES:
+            return
+        
         # Check content type
         if content_type not in DocumentProcessor.SUPPORTED_CONTENT_TYPES:
             raise UnsupportedFileTypeError(
@@ -141,20 +363,129 @@ class DocumentProcessor:
                 {"supported_types": list(DocumentProcessor.SUPPORTED_CONTENT_TYPES.keys())}
             )
         
-        # Double-check file extension matches content type
-        _, file_ext = os.path.splitext(filename.lower())
-        if file_ext not in DocumentProcessor.SUPPORTED_CONTENT_TYPES.get(content_type, []):
-            raise UnsupportedFileTypeError(
-                f"File extension {file_ext} does not match content type {content_type}",
-                {
-                    "extension": file_ext,
-                    "content_type": content_type,
-                    "expected_extensions": DocumentProcessor.SUPPORTED_CONTENT_TYPES.get(content_type, [])
-                }
-            )
+        # Otherwise the file extension doesn't match the content type
+        raise UnsupportedFileTypeError(
+            f"File extension {file_ext} does not match content type {content_type}",
+            {
+                "extension": file_ext,
+                "content_type": content_type,
+                "expected_extensions": DocumentProcessor.SUPPORTED_CONTENT_TYPES[content_type]
+            }
+        )
+    
+    @staticmethod
+    def _extract_pdf_text(file_content: bytes) -> Tuple[str, Optional[str]]:
+        """
+        Extract text from a PDF with PDFium, the C++ library used by Chrome
+        
+        Args:
+            file_content: Raw bytes of the PDF file
+            
+        Returns:
+            Tuple containing: (extracted_text, error_message)
+            
+        Raises:
+            pdfium.PdfiumError: If PDFium can't open the document
+        """
+        with _pdfium_lock:
+            pdf = pdfium.PdfDocument(file_content)
+            try:
+                page_count = len(pdf)
+                if page_count == 0:
+                    logger.warning("PDF has no pages")
+                    return "", "PDF has no pages"
+                
+                logger.info(f"PDF has {page_count} pages")
+                parallel = page_count >= DocumentProcessor.PARALLEL_PDF_MIN_PAGES and pdf_worker_count() > 1
+                if not parallel:
+                    page_texts = [read_pdf_page_text(pdf, i) for i in range(page_count)]
+            finally:
+                pdf.close()
+        
+        if parallel:
+            page_texts = DocumentProcessor._extract_pdf_pages_in_parallel(file_content, page_count)
+        
+        text = "\n".join(page_text for page_text in page_texts if page_text)
+        if not text.strip():
+            logger.warning("PDF appears to contain no extractable text (may be scanned document)")
+            return "", "PDF appears to contain no extractable text. The document may be scanned or contain only images."
+            
+        logger.info(f"Successfully extracted {len(text)} characters from PDF")
+        return text, None
+    
+    @staticmethod
+    def _extract_pdf_pages_in_parallel(file_content: bytes, page_count: int) -> List[str]:
+        """
+        Extract the text of every page of a PDF across the PDF process pool
+        
+        Pages are split into one contiguous range per pool worker, so each
+        worker parses the document once.
+        
+        Args:
+            file_content: Raw bytes of the PDF file
+            page_count: Number of pages in the PDF
+            
+        Returns:
+            Text of each page, in page order
+        """
+        pool = pdf_process_pool()
+        range_size = -(-page_count // pdf_worker_count())
+        futures = [
+            pool.submit(extract_pdf_page_range, file_content, start, min(start + range_size, page_count))
+            for start in range(0, page_count, range_size)
+        ]
+        return [page_text for future in futures for page_text in future.result()]
+    
+    @staticmethod
+    def extract_text(
+        file_content: bytes,
+        content_type: str,
+        filename: str = "",
+        content_hash: Optional[str] = None
+    ) -> Tuple[str, Optional[str]]:
+        """
+        Extract text from document based on content type, reusing recent results
+        
+        Purpose:
+        - Skip repeated extraction when the same content is processed again,
+          e.g. re-uploaded after a delete or a failed upload, or diagnosed
+        - Keep memory bounded by caching only files up to EXTRACTION_CACHE_MAX_FILE_SIZE
+        
+        Args:
+            file_content: Raw bytes of the file
+            content_type: MIME type of the file
+            filename: Original filename (for extension validation)
+            content_hash: Hash of file_content from compute_content_hash, if already known
+            
+        Returns:
+            Tuple containing: (extracted_text, error_message)
+            where error_message is None if successful, or contains an error description if failed
+        """
+        if len(file_content) > DocumentProcessor.EXTRACTION_CACHE_MAX_FILE_SIZE:
+            return DocumentProcessor._extract_text(file_content, content_type, filename)
+        
+        # Validation depends on the extension, so it is part of the key
+        key = (
+            content_hash or DocumentProcessor.compute_content_hash(file_content),
+            content_type,
+            os.path.splitext(filename.lower())[1]
+        )
+        with _extraction_cache_lock:
+            result = _extraction_cache.get(key)
+            if result is not None:
+                _extraction_cache.move_to_end(key)
+                return result
+        
+        result = DocumentProcessor._extract_text(file_content, content_type, filename)
+        
+        with _extraction_cache_lock:
+            _extraction_cache[key] = result
+            if len(_extraction_cache) > DocumentProcessor.EXTRACTION_CACHE_SIZE:
+                _extraction_cache.popitem(last=False)
+        return result
     
     @staticmethod
-    def extract_text(file_content: bytes, content_type: str, filename: str = "") -> Tuple[str, Optional[str]]:
+    def _extract_text(file_content: bytes, content_type: str, filename: str = "") -> Tuple[str, Optional[str]]:
         """
         Extract text from document based on content type
         
@@ -180,144 +511,178 @@ class DocumentProcessor:
                 logger.warning(f"File validation failed: {str(e)}", extra={"details": e.details})
                 return "", str(e)
                 
-            # Plain text files
-            if content_type == "text/plain":
-                try:
-                    return file_content.decode("utf-8"), None
-                except UnicodeDecodeError:
-                    error_msg = "Unable to decode text file. The file may be binary or use an unsupported encoding."
-                    logger.warning(error_msg)
-                    return "", error_msg
-                
-            # PDF files
-            elif content_type == "application/pdf":
-                try:
-                    logger.info(f"Starting PDF processing for file: {filename}")
-                    with io.BytesIO(file_content) as pdf_file:
-                        # Check if file is encrypted/password protected
-                        try:
-                            logger.info("Initializing PDF reader")
-                            reader = PyPDF2.PdfReader(pdf_file)
-                            logger.info(f"PDF reader initialized, is_encrypted: {reader.is_encrypted}")
-                            
-                            if reader.is_encrypted:
-                                error_msg = "PDF is encrypted and cannot be processed without a password."
-                                logger.warning(error_msg)
-                                return "", error_msg
-                            
-                            # Check if PDF has pages
-                            if len(reader.pages) == 0:
-                                logger.warning("PDF has no pages")
-                                return "", "PDF has no pages"
-                                
-                            # Extract text from all pages
-                            text = ""
-                            logger.info(f"PDF has {len(reader.pages)} pages")
-                            for i, page in enumerate(reader.pages):
-                                try:
-                                    logger.info(f"Extracting text from page {i+1}/{len(reader.pages)}")
-                                    page_text = page.extract_text()
-                                    if page_text:
-                                        text += page_text + "\n"
-                                        logger.debug(f"Extracted {len(page_text)} characters from page {i+1}")
-                                    else:
-                                        logger.warning(f"No text extracted from page {i+1}")
-                                except Exception as page_err:
-                                    logger.warning(f"Error extracting text from page {i}: {str(page_err)}", exc_info=True)
-                                    # Continue with other pages
-                            
-                            # Check if we got any text
-                            if not text.strip():
-                                logger.warning("PDF appears to contain no extractable text (may be scanned document)")
-                                return "", "PDF appears to contain no extractable text. The document may be scanned or contain only images."
-                                
-                            logger.info(f"Successfully extracted {len(text)} characters from PDF")
-                            return text, None
-                            
-                        except PyPDF2.errors.PdfReadError as pdf_err:
-                            error_msg = f"Invalid or corrupted PDF file: {str(pdf_err)}"
-                            logger.warning(error_msg, exc_info=True)
-                            
-                            # Try to reset the file position and read again with a more lenient approach
-                            try:
-                                pdf_file.seek(0)
-                                logger.info("Trying alternative PDF reading approach")
-                                
-                                # Check if it's even a PDF by looking at magic bytes
-                                pdf_file.seek(0)
-                                header = pdf_file.read(5)
-                                if header != b'%PDF-':
-                                    logger.error("File does not have PDF header bytes")
-                                    return "", "Not a valid PDF file. Missing PDF header."
-                                
-                                # Try a more lenient approach - if the file has a PDF header but can't be read
-                                # by PyPDF2, we'll attempt to extract at least some text by scanning for text strings
-                                logger.info("PDF header found, trying basic text extraction")
-                                pdf_file.seek(0)
-                                pdf_content = pdf_file.read()
-                                
-                                # Very simple text extraction - just look for readable ASCII text
-                                import re
-                                text_chunks = re.findall(b'[a-zA-Z0-9 .,;:!?\'"\-+=/\\\\()\[\]{}]{4,}', pdf_content)
-                                if text_chunks:
-                                    extracted_text = b'\n'.join(text_chunks).decode('utf-8', errors='ignore')
-                                    logger.info(f"Found {len(text_chunks)} text chunks using fallback method")
-                                    if len(extracted_text) > 100:  # If we found a reasonable amount of text
-                                        return extracted_text, None
-                                        
-                                # If we couldn't extract text or found too little, return the original error
-                                pdf_file.seek(0)
-                                return "", "The PDF file appears to be corrupted or in an unsupported format."
-                            except Exception as e:
-                                logger.error(f"Alternative PDF reading also failed: {str(e)}")
-                                return "", "The PDF file could not be processed."
-                            
-                except Exception as pdf_err:
-                    error_msg = f"PDF extraction error: {str(pdf_err)}"
-                    logger.error(error_msg, exc_info=True)
-                    return "", error_msg
-                
-            # Word documents
-            elif "application/vnd.openxmlformats-officedocument.wordprocessingml" in content_type:
-                try:
-                    with io.BytesIO(file_content) as docx_file:
-                        try:
-                            doc = docx.Document(docx_file)
-                            text = ""
-                            # Extract text from paragraphs
-                            for para in doc.paragraphs:
-                                text += para.text + "\n"
-                            
-                            # Extract text from tables
-                            for table in doc.tables:
-                                for row in table.rows:
-                                    for cell in row.cells:
-                                        text += cell.text + " "
-                                    text += "\n"
-                            
-                            # Check if we got any text
-                            if not text.strip():
-                                logger.warning("DOCX appears to contain no text")
-                                return "", "DOCX document appears to contain no text."
-                                
-                            return text, None
-                            
-                        except Exception as docx_format_err:
-                            error_msg = f"Invalid or corrupted DOCX file: {str(docx_format_err)}"
-                            logger.warning(error_msg)
-                            return "", error_msg
-                            
-                except Exception as docx_err:
-                    error_msg = f"DOCX extraction error: {str(docx_err)}"
-                    logger.error(error_msg, exc_info=True)
-                    return "", error_msg
-                
-            else:
+            # Hand the file to the extractor for its content type
+            extractor = TEXT_EXTRACTORS.get(content_type)
+            if extractor is None:
                 error_msg = f"Unsupported content type: {content_type}"
                 logger.warning(error_msg)
                 return "", error_msg
+            return extractor(file_content, filename)
                 
         except Exception as e:
             error_msg = f"Error extracting text: {str(e)}"
             logger.error(error_msg, exc_info=True)
-            return "", error_msg 
\ No newline at end of file
+            return "", error_msg 
+    
+    @staticmethod
+    def _extract_plain_text(file_content: bytes, filename: str) -> Tuple[str, Optional[str]]:
+        """Decode a plain text file as UTF-8"""
+        try:
+            return file_content.decode("utf-8"), None
+        except UnicodeDecodeError as decode_err:
+            error_msg = (
+                f"Unable to decode text file: invalid UTF-8 at byte {decode_err.start}. "
+                "The file may be binary or use an unsupported encoding."
+            )
+            logger.warning(error_msg)
+            return "", error_msg
+    
+    @staticmethod
+    def _extract_pdf(file_content: bytes, filename: str) -> Tuple[str, Optional[str]]:
+        """Extract text from a PDF with PDFium, falling back to PyPDF2 and a raw text scan"""
+        try:
+            logger.info(f"Starting PDF processing for file: {filename}")
+            
+            # Reject non-PDF uploads before handing them to either parser
+            if DocumentProcessor.find_pdf_header(file_content) < 0:
+                logger.warning("File does not have PDF header bytes")
+                return "", "Not a valid PDF file. Missing PDF header."
+            
+            # PDFs that PDFium can't open fall through to PyPDF2 and its recovery scan
+            if PDFIUM_AVAILABLE:
+                try:
+                    return DocumentProcessor._extract_pdf_text(file_content)
+                except pdfium.PdfiumError as pdf_err:
+                    if getattr(pdf_err, "err_code", None) == pdfium.raw.FPDF_ERR_PASSWORD:
+                        error_msg = "PDF is encrypted and cannot be processed without a password."
+                        logger.warning(error_msg)
+                        return "", error_msg
+                    logger.warning(f"PDFium could not open PDF, trying PyPDF2: {str(pdf_err)}")
+            
+            with io.BytesIO(file_content) as pdf_file:
+                # Check if file is encrypted/password protected
+                try:
+                    logger.info("Initializing PDF reader")
+                    reader = PyPDF2.PdfReader(pdf_file)
+                    logger.info(f"PDF reader initialized, is_encrypted: {reader.is_encrypted}")
+                    
+                    if reader.is_encrypted:
+                        error_msg = "PDF is encrypted and cannot be processed without a password."
+                        logger.warning(error_msg)
+                        return "", error_msg
+                    
+                    # Check if PDF has pages
+                    if len(reader.pages) == 0:
+                        logger.warning("PDF has no pages")
+                        return "", "PDF has no pages"
+                        
+                    # Extract text from all pages
+                    page_texts = []
+                    failed_pages = 0
+                    first_page_err = None
+                    logger.info(f"PDF has {len(reader.pages)} pages")
+                    # Per-page messages are only built when debug logging is enabled
+                    log_pages = logger.isEnabledFor(logging.DEBUG)
+                    for i, page in enumerate(reader.pages):
+                        try:
+                            page_text = page.extract_text()
+                            if page_text:
+                                page_texts.append(page_text)
+                                if log_pages:
+                                    logger.debug(f"Extracted {len(page_text)} characters from page {i+1}")
+                            elif log_pages:
+                                logger.debug(f"No text extracted from page {i+1}")
+                        except Exception as page_err:
+                            # Failures are summarized after the loop rather than logged per page
+                            failed_pages += 1
+                            first_page_err = first_page_err or page_err
+                            # Continue with other pages
+                        
+                        # A document failing on most of its first pages is treated as corrupted
+                        if i + 1 == DocumentProcessor.PDF_PAGE_FAILURE_SAMPLE and failed_pages * 2 > i + 1:
+                            raise PyPDF2.errors.PdfReadError(
+                                f"Text extraction failed on {failed_pages} of the first {i + 1} pages: {str(first_page_err)}"
+                            )
+                    
+                    if failed_pages:
+                        logger.warning(f"PDF page extraction failed on {failed_pages}/{len(reader.pages)} pages, first error: {first_page_err!r}")
+                    
+                    text = "\n".join(page_texts)
+                    
+                    # Check if we got any text
+                    if not text.strip():
+                        logger.warning("PDF appears to contain no extractable text (may be scanned document)")
+                        return "", "PDF appears to contain no extractable text. The document may be scanned or contain only images."
+                        
+                    logger.info(f"Successfully extracted {len(text)} characters from PDF")
+                    return text, None
+                    
+                except PyPDF2.errors.PdfReadError as pdf_err:
+                    error_msg = f"Invalid or corrupted PDF file: {str(pdf_err)}"
+                    logger.warning(error_msg, exc_info=True)
+                    
+                    # Try to reset the file position and read again with a more lenient approach
+                    try:
+                        logger.info("Trying alternative PDF reading approach")
+                        
+                        # Try a more lenient approach - the file has a PDF header (checked above) but can't be read
+                        # by PyPDF2, so we'll attempt to extract at least some text by scanning for text strings
+                        pdf_file.seek(0)
+                        pdf_content = pdf_file.read()
+                        
+                        # Very simple text extraction - just look for readable ASCII text
+                        text_chunks = PDF_TEXT_PATTERN.findall(pdf_content)
+                        if text_chunks:
+                            # Matches are pure ASCII, so they decode without validation
+                            extracted_text = b'\n'.join(text_chunks).decode('ascii')
+                            logger.info(f"Found {len(text_chunks)} text chunks using fallback method")
+                            if len(extracted_text) > 100:  # If we found a reasonable amount of text
+                                return extracted_text, None
+                                
+                        # If we couldn't extract text or found too little, return the original error
+                        pdf_file.seek(0)
+                        return "", "The PDF file appears to be corrupted or in an unsupported format."
+                    except Exception as e:
+                        logger.error(f"Alternative PDF reading also failed: {str(e)}")
+                        return "", "The PDF file could not be processed."
+                    
+        except Exception as pdf_err:
+            error_msg = f"PDF extraction error: {str(pdf_err)}"
+            logger.error(error_msg, exc_info=True)
+            return "", error_msg
+    
+    @staticmethod
+    def _extract_docx(file_content: bytes, filename: str) -> Tuple[str, Optional[str]]:
+        """Extract text from a DOCX document"""
+        try:
+            with io.BytesIO(file_content) as docx_file:
+                try:
+                    doc = docx.Document(docx_file)
+                    # Body text in document order, table cells one per line
+                    text = read_docx_body_text(doc.element.body)
+                    
+                    # Check if we got any text
+                    if not text.strip():
+                        logger.warning("DOCX appears to contain no text")
+                        return "", "DOCX document appears to contain no text."
+                        
+                    return text, None
+                    
+                except Exception as docx_format_err:
+                    error_msg = f"Invalid or corrupted DOCX file: {str(docx_format_err)}"
+                    logger.warning(error_msg)
+                    return "", error_msg
+                    
+        except Exception as docx_err:
+            error_msg = f"DOCX extraction error: {str(docx_err)}"
+            logger.error(error_msg, exc_info=True)
+            return "", error_msg
+
+
+# Text extraction method for each supported content type, so extract_text picks
+# the handler for a file with a single lookup
+TEXT_EXTRACTORS: Dict[str, Callable[[bytes, str], Tuple[str, Optional[str]]]] = {
+    "text/plain": DocumentProcessor._extract_plain_text,
+    "application/pdf": DocumentProcessor._extract_pdf,
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": DocumentProcessor._extract_docx,
+}
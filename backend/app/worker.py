@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from typing import Any, List
+
+from celery import Celery
+
+from app.core.cache import close_redis
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def broker_url() -> str:
+    """Celery broker URL, defaulting to a separate database on the cache's Redis server"""
+    if settings.CELERY_BROKER_URL:
+        return settings.CELERY_BROKER_URL
+    auth = f":{settings.REDIS_PASSWORD}@" if settings.REDIS_PASSWORD else ""
+    return f"redis://{auth}{settings.REDIS_HOST}:{settings.REDIS_PORT}/1"
+
+
+celery_app = Celery("compuj", broker=broker_url())
+celery_app.conf.update(
+    # Model-bound tasks run on dedicated classification workers
+    task_routes={"app.worker.reclassify_page": {"queue": "classification"}},
+    # Tasks are long and memory-heavy, so take one at a time and only ack once done
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    task_ignore_result=True,
+)
+
+
+@celery_app.task(
+    bind=True,
+    acks_late=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    retry_kwargs={"max_retries": 5}
+)
+def reclassify_page(self, file_ids: List[Any]) -> int:
+    """
+    Reclassify a page of files by ID
+    
+    Args:
+        file_ids: IDs of the files to reclassify
+        
+    Returns:
+        Number of documents reclassified
+    """
+    # Imported here since the files routes queue this task
+    from app.api.routes.files import reclassify_documents
+    from app.db.supabase import get_supabase_client
+    
+    supabase_client = get_supabase_client()
+    documents = (
+        supabase_client.table("files")
+        .select("id, content")
+        .in_("id", file_ids)
+        .not_.is_("content", "null")
+        .neq("content", "")
+        .execute()
+        .data
+    ) or []
+    
+    async def run() -> int:
+        try:
+            return await reclassify_documents(supabase_client, documents)
+        finally:
+            # Pooled connections belong to this task's event loop
+            await close_redis()
+    
+    reclassified = asyncio.run(run())
+    logger.info(f"Reclassified {reclassified} of {len(file_ids)} documents")
+    return reclassified
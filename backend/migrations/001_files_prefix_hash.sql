@@ -0,0 +1,5 @@
+-- Staged duplicate detection: uploads are matched on size and the hash of
+-- the first 4 KB before full content hashes are compared.
+ALTER TABLE files ADD COLUMN IF NOT EXISTS prefix_hash text;
+
+CREATE INDEX IF NOT EXISTS files_size_prefix_hash_idx ON files (size, prefix_hash);
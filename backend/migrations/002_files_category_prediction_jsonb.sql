@@ -0,0 +1,5 @@
+-- Store category predictions as jsonb so PostgREST returns parsed objects
+-- and predictions can be filtered server-side.
+ALTER TABLE files
+    ALTER COLUMN category_prediction TYPE jsonb
+    USING category_prediction::jsonb;
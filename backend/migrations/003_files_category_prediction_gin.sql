@@ -0,0 +1,5 @@
+-- GIN index over category predictions. The default jsonb_ops operator class
+-- is used (rather than jsonb_path_ops) so key-existence (?) lookups are
+-- indexed as well as containment (@>).
+CREATE INDEX IF NOT EXISTS files_category_prediction_gin
+    ON files USING gin (category_prediction);
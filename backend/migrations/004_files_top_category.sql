@@ -0,0 +1,21 @@
+-- Materialize the highest-scoring predicted category so listing by category
+-- is an indexed equality scan instead of a jsonb lookup per row.
+-- Generated columns cannot contain subqueries, so the lookup is wrapped in an
+-- IMMUTABLE function.
+CREATE OR REPLACE FUNCTION files_top_category(prediction jsonb)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+AS $$
+    SELECT key
+    FROM jsonb_each_text(prediction)
+    ORDER BY value::numeric DESC
+    LIMIT 1
+$$;
+
+ALTER TABLE files
+    ADD COLUMN IF NOT EXISTS top_category text
+    GENERATED ALWAYS AS (files_top_category(category_prediction)) STORED;
+
+CREATE INDEX IF NOT EXISTS files_top_category_uploaded_at_idx
+    ON files (top_category, uploaded_at DESC);
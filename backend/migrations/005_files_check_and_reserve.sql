@@ -0,0 +1,45 @@
+-- Uploads reserve their file record before processing so duplicate detection
+-- and reservation happen atomically in a single round-trip. Reserved records
+-- stay 'pending' until the file is stored, then become 'ready'.
+ALTER TABLE files ADD COLUMN IF NOT EXISTS status text NOT NULL DEFAULT 'ready';
+
+CREATE OR REPLACE FUNCTION check_and_reserve(
+    p_hash text,
+    p_prefix_hash text,
+    p_filename text,
+    p_content_type text,
+    p_size bigint
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    existing files%ROWTYPE;
+    reserved_id files.id%TYPE;
+BEGIN
+    -- Serialize concurrent uploads of the same content until this transaction ends
+    PERFORM pg_advisory_xact_lock(hashtext(p_hash));
+
+    -- Staged match: size, then prefix hash (absent on older rows), then full hash
+    SELECT * INTO existing
+    FROM files
+    WHERE size = p_size
+      AND (prefix_hash IS NULL OR prefix_hash = p_prefix_hash)
+      AND content_hash = p_hash
+    LIMIT 1;
+
+    IF FOUND THEN
+        RETURN jsonb_build_object(
+            'duplicate_id', existing.id,
+            'duplicate_filename', existing.filename,
+            'duplicate_status', existing.status
+        );
+    END IF;
+
+    INSERT INTO files (filename, content_type, size, content_hash, prefix_hash, status)
+    VALUES (p_filename, p_content_type, p_size, p_hash, p_prefix_hash, 'pending')
+    RETURNING id INTO reserved_id;
+
+    RETURN jsonb_build_object('reserved', true, 'id', reserved_id);
+END;
+$$;
@@ -0,0 +1,12 @@
+-- Bulk update of category predictions used by reclassification, so a page of
+-- documents is written in one statement. An upsert cannot be used because it
+-- would need every NOT NULL column of the rows it might insert.
+CREATE OR REPLACE FUNCTION update_category_predictions(updates jsonb)
+RETURNS void
+LANGUAGE sql
+AS $$
+    UPDATE files
+    SET category_prediction = u.category_prediction
+    FROM jsonb_to_recordset(updates) AS u(id bigint, category_prediction jsonb)
+    WHERE files.id = u.id;
+$$;
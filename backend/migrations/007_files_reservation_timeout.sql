@@ -0,0 +1,57 @@
+-- Reservations left 'pending' by an upload that never finished (a crashed or
+-- restarted worker) would otherwise match every later upload of the same
+-- content as a duplicate. Reserved records are timestamped, and
+-- check_and_reserve reclaims pending records older than the timeout.
+-- Existing rows, including any pending ones, are stamped with the migration time.
+ALTER TABLE files ADD COLUMN IF NOT EXISTS reserved_at timestamptz NOT NULL DEFAULT now();
+
+-- The new parameter changes the signature, so the old function is replaced
+DROP FUNCTION IF EXISTS check_and_reserve(text, text, text, text, bigint);
+
+CREATE FUNCTION check_and_reserve(
+    p_hash text,
+    p_prefix_hash text,
+    p_filename text,
+    p_content_type text,
+    p_size bigint,
+    p_reservation_timeout_seconds integer DEFAULT 1800
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    existing files%ROWTYPE;
+    reserved_id files.id%TYPE;
+BEGIN
+    -- Serialize concurrent uploads of the same content until this transaction ends
+    PERFORM pg_advisory_xact_lock(hashtext(p_hash));
+
+    -- Reclaim reservations whose upload was abandoned
+    DELETE FROM files
+    WHERE content_hash = p_hash
+      AND status = 'pending'
+      AND reserved_at < now() - make_interval(secs => p_reservation_timeout_seconds);
+
+    -- Staged match: size, then prefix hash (absent on older rows), then full hash
+    SELECT * INTO existing
+    FROM files
+    WHERE size = p_size
+      AND (prefix_hash IS NULL OR prefix_hash = p_prefix_hash)
+      AND content_hash = p_hash
+    LIMIT 1;
+
+    IF FOUND THEN
+        RETURN jsonb_build_object(
+            'duplicate_id', existing.id,
+            'duplicate_filename', existing.filename,
+            'duplicate_status', existing.status
+        );
+    END IF;
+
+    INSERT INTO files (filename, content_type, size, content_hash, prefix_hash, status, reserved_at)
+    VALUES (p_filename, p_content_type, p_size, p_hash, p_prefix_hash, 'pending', now())
+    RETURNING id INTO reserved_id;
+
+    RETURN jsonb_build_object('reserved', true, 'id', reserved_id);
+END;
+$$;
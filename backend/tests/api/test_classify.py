@@ -0,0 +1,37 @@
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from fastapi import status
+
+
+class TestClassifyRoutes:
+    """Tests for the classify routes."""
+
+    def test_classify_text(self, test_client):
+        """Test classifying text."""
+        prediction = {"Legal Document": 0.9, "Other": 0.1}
+        
+        with patch("app.api.routes.files.classification_batcher.submit", AsyncMock(return_value=prediction)) as mock_submit:
+            response = test_client.post("/api/v1/classify/", json={"text": "This agreement is made between the parties. " * 10})
+        
+        # Check the response
+        assert response.status_code == status.HTTP_200_OK
+        response_data = response.json()
+        assert response_data["status"] == "success"
+        assert response_data["data"] == prediction
+        mock_submit.assert_called_once()
+
+    def test_classify_short_text(self, test_client):
+        """Test that text too short to classify is returned as Other."""
+        with patch("app.api.routes.files.classification_batcher.submit", AsyncMock()) as mock_submit:
+            response = test_client.post("/api/v1/classify/", json={"text": "Too short"})
+        
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["data"] == {"Other": 1.0}
+        mock_submit.assert_not_called()
+
+    def test_classify_empty_text(self, test_client):
+        """Test that empty text is rejected."""
+        response = test_client.post("/api/v1/classify/", json={"text": ""})
+        
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -1,7 +1,7 @@
 import io
 import json
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock, MagicMock
 
 from fastapi import status
 from app.core.exceptions import DocumentNotFound
@@ -13,13 +13,9 @@ class TestFileRoutes:
     def test_get_files(self, test_client, mock_supabase, sample_file_data):
         """Test getting all files."""
         # Configure the mock to return sample data
-        mock_execute = mock_supabase.table.return_value.select.return_value.order.return_value.range.return_value.execute.return_value
+        mock_execute = mock_supabase.table.return_value.select.return_value.eq.return_value.order.return_value.range.return_value.execute.return_value
         mock_execute.data = [sample_file_data]
-        
-        # Configure count response
-        mock_count_response = MagicMock()
-        mock_count_response.count = 1
-        mock_supabase.table.return_value.select.return_value.execute.return_value = mock_count_response
+        mock_execute.count = 1
         
         # Make the request
         response = test_client.get("/api/v1/files/")
@@ -48,6 +44,9 @@ class TestFileRoutes:
         assert response_data["status"] == "success"
         assert response_data["data"]["id"] == sample_file_data["id"]
         assert response_data["data"]["filename"] == sample_file_data["filename"]
+        
+        # Pending records reserved for uploads in progress are not returned
+        mock_supabase.table.return_value.select.return_value.eq.assert_any_call("status", "ready")
 
     def test_get_file_not_found(self, test_client, mock_supabase):
         """Test getting a file that doesn't exist."""
@@ -65,24 +64,24 @@ class TestFileRoutes:
         assert "999" in response_data["message"]
 
     @patch("app.services.document_processor.DocumentProcessor.extract_text")
-    @patch("app.services.document_classifier.DocumentClassifier.classify_document")
+    @patch("app.services.document_classifier.DocumentClassifier.classify_batch")
     def test_upload_file(self, mock_classify, mock_extract, test_client, mock_supabase, sample_file_data):
         """Test uploading a file."""
         # Configure mocks
         mock_extract.return_value = ("Test document content", None)
-        mock_classify.return_value = {"invoice": 0.85, "receipt": 0.10, "other": 0.05}
+        mock_classify.return_value = [{"invoice": 0.85, "receipt": 0.10, "other": 0.05}]
         
         # Configure the storage mock
         mock_upload = mock_supabase.storage.from_.return_value.upload
         mock_upload.return_value = {"Key": "test-key"}
         
-        # Configure the database mock
-        mock_execute = mock_supabase.table.return_value.insert.return_value.execute.return_value
-        mock_execute.data = [sample_file_data]
+        # No duplicate exists, so a record is reserved for the upload
+        mock_reserve = mock_supabase.rpc.return_value.execute.return_value
+        mock_reserve.data = {"reserved": True, "id": sample_file_data["id"]}
         
-        # Check that no files exist with similar content (for duplicate check)
-        mock_all_files = mock_supabase.table.return_value.select.return_value.execute.return_value
-        mock_all_files.data = []
+        # Configure the database mock that completes the reserved record
+        mock_execute = mock_supabase.table.return_value.update.return_value.eq.return_value.execute.return_value
+        mock_execute.data = [sample_file_data]
         
         # Create a test file
         test_file = io.BytesIO(b"Test file content")
@@ -93,12 +92,66 @@ class TestFileRoutes:
             files={"file": ("test.pdf", test_file, "application/pdf")}
         )
         
-        # Check the response
-        assert response.status_code == status.HTTP_201_CREATED
+        # Check the upload was accepted for background processing
+        assert response.status_code == status.HTTP_202_ACCEPTED
         response_data = response.json()
         assert response_data["status"] == "success"
-        assert response_data["message"] == "File uploaded successfully"
-        assert response_data["data"]["id"] == sample_file_data["id"]
+        assert response_data["message"] == "File accepted for processing"
+        job_id = response_data["data"]["job_id"]
+        
+        # Background tasks run before the TestClient returns, so the job is complete
+        response = test_client.get(f"/api/v1/jobs/{job_id}")
+        assert response.status_code == status.HTTP_200_OK
+        job = response.json()["data"]
+        assert job["status"] == "completed"
+        assert job["message"] == "File uploaded successfully"
+        assert job["result"]["id"] == sample_file_data["id"]
+        mock_supabase.table.return_value.update.return_value.eq.assert_called_once_with("id", sample_file_data["id"])
+
+    @patch("app.services.document_processor.DocumentProcessor.extract_text")
+    @patch("app.services.document_classifier.DocumentClassifier.classify_batch")
+    def test_upload_fails_when_reservation_is_gone(self, mock_classify, mock_extract, test_client, mock_supabase, sample_file_data):
+        """Test that an upload whose reserved record no longer exists fails and removes the stored file."""
+        mock_extract.return_value = ("Test document content", None)
+        mock_classify.return_value = [{"invoice": 0.85, "receipt": 0.10, "other": 0.05}]
+        mock_reserve = mock_supabase.rpc.return_value.execute.return_value
+        mock_reserve.data = {"reserved": True, "id": sample_file_data["id"]}
+
+        # The reserved record was reclaimed, so completing it updates no rows
+        mock_execute = mock_supabase.table.return_value.update.return_value.eq.return_value.execute.return_value
+        mock_execute.data = []
+
+        response = test_client.post(
+            "/api/v1/files/upload/",
+            files={"file": ("test.pdf", io.BytesIO(b"Test file content"), "application/pdf")}
+        )
+        assert response.status_code == status.HTTP_202_ACCEPTED
+
+        response = test_client.get(f"/api/v1/jobs/{response.json()['data']['job_id']}")
+        job = response.json()["data"]
+        assert job["status"] == "failed"
+        assert job["error"]["error"] == "DATABASE_ERROR"
+        mock_supabase.storage.from_.return_value.remove.assert_called_once()
+
+    def test_upload_releases_reservation_on_failure(self, test_client, mock_supabase, sample_file_data):
+        """Test that a reserved record is released when the upload fails before processing starts."""
+        # No duplicate exists, so a record is reserved for the upload
+        mock_reserve = mock_supabase.rpc.return_value.execute.return_value
+        mock_reserve.data = {"reserved": True, "id": sample_file_data["id"]}
+        
+        with patch("app.api.routes.files.JobStore.create", AsyncMock(side_effect=RuntimeError("job store down"))):
+            response = test_client.post(
+                "/api/v1/files/upload/",
+                files={"file": ("test.pdf", io.BytesIO(b"Test file content"), "application/pdf")}
+            )
+        
+        assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+        
+        # Only the still-pending reserved record is deleted
+        mock_supabase.table.return_value.delete.assert_called_once()
+        mock_filter = mock_supabase.table.return_value.delete.return_value.eq
+        mock_filter.assert_any_call("id", sample_file_data["id"])
+        mock_filter.assert_any_call("status", "pending")
 
     def test_delete_file(self, test_client, mock_supabase, sample_file_data):
         """Test deleting a file."""
@@ -4,13 +4,23 @@ from unittest.mock import MagicMock, patch
 
 from app.main import app
 
+try:
+    import uvloop  # noqa: F401
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
 
-@pytest.fixture
+
+@pytest.fixture(scope="session")
 def test_client():
     """
     TestClient fixture for making API requests during tests.
+    
+    Shared by the whole test session, so the app's startup and shutdown
+    run once rather than for every test. Requests run on uvloop when it
+    is installed, as they would under uvicorn.
     """
-    with TestClient(app) as client:
+    with TestClient(app, backend_options={"use_uvloop": UVLOOP_AVAILABLE}) as client:
         yield client
 
 
@@ -18,6 +28,9 @@ def test_client():
 def mock_supabase():
     """
     Mock Supabase client for testing.
+    
+    Created fresh for each test: reset_mock() would keep attributes such as
+    execute().data set by a previous test.
     """
     with patch("app.db.supabase.get_supabase_client") as mock:
         # Create a mock Supabase client
@@ -45,6 +45,22 @@ class TestFileWorkflowIntegration:
             except Exception as e:
                 print(f"Error cleaning up test file {file_id}: {str(e)}")
     
+    def wait_for_upload(self, upload_response, timeout: float = 60):
+        """Poll the background job of an accepted upload and return its stored file"""
+        assert upload_response.status_code == 202, f"Upload failed: {upload_response.text}"
+        job_id = upload_response.json()["data"]["job_id"]
+        
+        deadline = time.monotonic() + timeout
+        while True:
+            response = self.client.get(f"/api/v1/jobs/{job_id}")
+            assert response.status_code == 200, f"Job lookup failed: {response.text}"
+            job = response.json()["data"]
+            if job["status"] == "completed":
+                return job["result"]
+            assert job["status"] != "failed", f"Upload processing failed: {job['error']}"
+            assert time.monotonic() < deadline, f"Upload job {job_id} did not finish in {timeout}s"
+            time.sleep(0.5)
+    
     def test_file_upload_and_retrieval(self):
         """Test uploading a text file and then retrieving it"""
         # Create a simple text file
@@ -60,18 +76,16 @@ class TestFileWorkflowIntegration:
             files={"file": (filename, file_obj, "text/plain")}
         )
         
-        # Verify upload response
-        assert response.status_code == 201, f"Upload failed: {response.text}"
-        upload_data = response.json()
-        assert upload_data["status"] == "success"
+        # Verify X-API-Version header
+        assert response.headers.get("X-API-Version") == "v1"
+        
+        # Wait for the upload to be processed
+        upload_data = self.wait_for_upload(response)
         
         # Store file ID for cleanup
-        file_id = upload_data["data"]["id"]
+        file_id = upload_data["id"]
         self.__class__.test_file_ids.append(file_id)
         
-        # Verify X-API-Version header
-        assert response.headers.get("X-API-Version") == "v1"
-        
         # Get the file by ID
         response = self.client.get(f"/api/v1/files/{file_id}")
         assert response.status_code == 200
@@ -113,9 +127,7 @@ class TestFileWorkflowIntegration:
         )
         
         # Verify upload
-        assert response.status_code == 201
-        upload_data = response.json()
-        file_id = upload_data["data"]["id"]
+        file_id = self.wait_for_upload(response)["id"]
         
         # Delete the file
         response = self.client.delete(f"/api/v1/files/{file_id}")
@@ -134,7 +146,7 @@ class TestFileWorkflowIntegration:
     def test_file_cache_invalidation(self):
         """Test that cache invalidation works for file operations"""
         # Turn on caching for this test
-        with patch("app.core.config.settings.CACHE_ENABLED", True):
+        with patch("app.core.cache.CACHE_ENABLED", True):
             # Create a file
             content = "Testing cache invalidation"
             file_obj = io.BytesIO(content.encode("utf-8"))
@@ -148,9 +160,7 @@ class TestFileWorkflowIntegration:
                 files={"file": (filename, file_obj, "text/plain")}
             )
             
-            assert response.status_code == 201
-            upload_data = response.json()
-            file_id = upload_data["data"]["id"]
+            file_id = self.wait_for_upload(response)["id"]
             self.__class__.test_file_ids.append(file_id)
             
             # First get - should be a cache miss
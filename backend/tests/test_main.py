@@ -1,6 +1,19 @@
 import pytest
+from collections import OrderedDict
 from fastapi import status
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from app.core import cache
+from app.core.middleware import BODY_TOO_LARGE_HEADERS, PROCESS_TIME_HEADER, TimingMiddleware
+from app.core.rate_limiter import RateLimiter
+from app.main import app
+
+# Headers of a browser CORS preflight for a GET sending a Content-Type header
+PREFLIGHT_HEADERS = {
+    "Origin": "http://localhost:3000",
+    "Access-Control-Request-Method": "GET",
+    "Access-Control-Request-Headers": "Content-Type",
+}
 
 
 class TestMainApp:
@@ -13,55 +26,108 @@ class TestMainApp:
         assert response.status_code == status.HTTP_200_OK
         data = response.json()
         assert data["status"] == "healthy"
-        assert "version" in data
-        assert "environment" in data
+        assert {"version", "environment"} <= data.keys()
+
+    def test_process_time_header(self, test_client):
+        """Test that X-Process-Time header is set."""
+        response = test_client.get("/api/docs")
+        
+        assert response.status_code == status.HTTP_200_OK
+        
+        # The time has six fixed decimals, so any non-zero value sorts after zero as a string
+        process_time = response.headers["x-process-time"]
+        assert process_time.replace(".", "", 1).isdigit()
+        assert process_time > "0.000000"
 
     def test_root_redirect(self, test_client):
         """Test the root endpoint redirects to docs."""
-        response = test_client.get("/", follow_redirects=False)
+        response = test_client.head("/", follow_redirects=False)
         
         assert response.status_code == status.HTTP_307_TEMPORARY_REDIRECT
         assert response.headers["location"] == "/api/docs"
 
-    @patch("app.core.rate_limiter.RateLimiter.is_allowed")
-    def test_rate_limiting(self, mock_is_allowed, test_client):
+    def test_rate_limiting(self, monkeypatch, test_client):
         """Test that rate limiting works."""
-        # Configure mock to simulate rate limit exceeded
-        mock_is_allowed.return_value = False
+        # Drive the app's own limiter through its in-memory counts, allowing one request per window
+        rate_limiter = next(
+            middleware.kwargs["rate_limiter"]
+            for middleware in app.user_middleware
+            if middleware.cls is TimingMiddleware
+        )
+        monkeypatch.setattr(cache, "redis_client", None)
+        monkeypatch.setattr(rate_limiter, "rate", 1)
+        monkeypatch.setattr(rate_limiter, "clients", OrderedDict())
+        
+        # The first request in the window is allowed and counted
+        response = test_client.get("/api/docs")
+        assert response.status_code != status.HTTP_429_TOO_MANY_REQUESTS
+        assert rate_limiter.clients["testclient"][0] == 1
         
         # Make a request which should be rate limited
-        response = test_client.get("/api/v1/files/")
+        response = test_client.get("/api/docs")
         
-        # Check that we get a 429 Too Many Requests response
+        # Check that we get a 429 Too Many Requests response, without the rejected request being counted
         assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
-        data = response.json()
-        assert data["error"] == "RATE_LIMIT_EXCEEDED"
-        assert "rate limit" in data["message"].lower()
+        assert 1 <= int(response.headers["retry-after"]) <= rate_limiter.per
+        assert rate_limiter.clients["testclient"][0] == 1
+        
+        # The body is prebuilt compact JSON, so it is checked without decoding
+        content = response.content
+        assert b'"error":"RATE_LIMIT_EXCEEDED"' in content
+        assert b'"message":"Too many requests. Please try again later."' in content
 
-    def test_cors_headers(self, test_client):
+    def test_job_polling_not_rate_limited(self, monkeypatch, test_client):
+        """Test that polling upload job status is not counted against the rate limit."""
+        mock_check = AsyncMock(return_value=(False, 60))
+        monkeypatch.setattr(RateLimiter, "check", mock_check)
+        
+        response = test_client.get("/api/v1/jobs/unknown-job")
+        
+        assert response.status_code != status.HTTP_429_TOO_MANY_REQUESTS
+        mock_check.assert_not_called()
+
+    def test_oversized_upload_rejected(self, test_client):
+        """Test that bodies over the upload limit are rejected from their Content-Length."""
+        from app.services.document_processor import DocumentProcessor
+        
+        response = test_client.post(
+            "/api/v1/files/upload/",
+            content=b"x",
+            headers={"Content-Length": str(DocumentProcessor.MAX_UPLOAD_REQUEST_SIZE + 1)}
+        )
+        
+        assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        assert response.json()["error"] == "REQUEST_TOO_LARGE"
+        
+        # Rejections are timed too, without adding the header to their shared header list
+        assert "x-process-time" in response.headers
+        assert all(name != PROCESS_TIME_HEADER for name, _ in BODY_TOO_LARGE_HEADERS)
+
+    def test_cors_headers(self, monkeypatch, test_client):
         """Test that CORS headers are set correctly."""
+        mock_check = AsyncMock(return_value=(True, 60))
+        monkeypatch.setattr(RateLimiter, "check", mock_check)
+        
         # Make a preflight request
-        response = test_client.options(
-            "/api/v1/files/",
-            headers={
-                "Origin": "http://localhost:3000",
-                "Access-Control-Request-Method": "GET",
-                "Access-Control-Request-Headers": "Content-Type",
-            }
-        )
+        response = test_client.options("/api/v1/files/", headers=PREFLIGHT_HEADERS)
         
         # Check that CORS headers are set
         assert response.status_code == status.HTTP_200_OK
         assert "access-control-allow-origin" in response.headers
-        assert response.headers["access-control-allow-origin"] == "*"  # In test mode, allows all origins
-
-    def test_process_time_header(self, test_client):
-        """Test that X-Process-Time header is set."""
-        response = test_client.get("/health")
+        # Credentials are allowed, so the request's origin is echoed rather than "*"
+        assert response.headers["access-control-allow-origin"] == PREFLIGHT_HEADERS["Origin"]
+        assert response.headers["access-control-max-age"] == "86400"
         
-        assert response.status_code == status.HTTP_200_OK
-        assert "x-process-time" in response.headers
+        # Preflights are not counted against the rate limit
+        mock_check.assert_not_called()
+
+    def test_cors_preflight_adversarial_acrh(self, test_client):
+        """Test that preflights with an oversized Access-Control-Request-Headers are rejected."""
+        response = test_client.options(
+            "/api/v1/files/",
+            headers={**PREFLIGHT_HEADERS, "Access-Control-Request-Headers": "," * 100000}
+        )
         
-        # Verify that the process time is a floating point number
-        process_time = float(response.headers["x-process-time"])
-        assert process_time > 0 
\ No newline at end of file
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.json()["error"] == "PREFLIGHT_HEADERS_TOO_LARGE"
+        assert "access-control-allow-headers" not in response.headers
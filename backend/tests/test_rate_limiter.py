@@ -0,0 +1,96 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+
+from app.core import cache
+from app.core import rate_limiter as rate_limiter_module
+from app.core.rate_limiter import RateLimiter
+
+SECOND_NS = 1_000_000_000
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    Virtual monotonic clock for the in-memory limiter, advanced by the tests.
+    """
+    now = SimpleNamespace(ns=1_000 * SECOND_NS)
+    monkeypatch.setattr(rate_limiter_module, "time", SimpleNamespace(monotonic_ns=lambda: now.ns))
+    return now
+
+
+class TestRateLimiter:
+    """Tests for the fixed-window rate limiter's in-memory counts."""
+
+    @pytest.mark.parametrize("rate,requests,expected", [
+        (1, 2, [True, False]),
+        (3, 5, [True, True, True, False, False]),
+        (5, 5, [True] * 5),
+    ])
+    def test_burst_within_window(self, clock, rate, requests, expected):
+        """Test that up to rate requests are allowed within one window."""
+        limiter = RateLimiter(rate=rate, per=60)
+        
+        assert [limiter._check_local("client")[0] for _ in range(requests)] == expected
+        
+        # Rejected requests aren't counted
+        assert limiter.clients["client"][0] == min(rate, requests)
+
+    @pytest.mark.parametrize("elapsed,allowed", [
+        (59, False),
+        (60, True),
+        (61, True),
+    ])
+    def test_window_rollover(self, clock, elapsed, allowed):
+        """Test that a new window starts once the previous one has passed."""
+        limiter = RateLimiter(rate=1, per=60)
+        assert limiter._check_local("client") == (True, 60)
+        
+        clock.ns += elapsed * SECOND_NS
+        
+        assert limiter._check_local("client")[0] is allowed
+
+    def test_retry_after(self, clock):
+        """Test that Retry-After counts whole seconds until the window resets, rounded up."""
+        limiter = RateLimiter(rate=1, per=60)
+        limiter._check_local("client")
+        
+        clock.ns += 20 * SECOND_NS + 1
+        
+        assert limiter._check_local("client") == (False, 40)
+
+    def test_clients_counted_separately(self, clock):
+        """Test that each client has its own window."""
+        limiter = RateLimiter(rate=1, per=60)
+        
+        assert limiter._check_local("a")[0] is True
+        assert limiter._check_local("b")[0] is True
+        assert limiter._check_local("a")[0] is False
+
+    def test_expired_clients_removed(self, clock):
+        """Test that clients whose window has passed are dropped."""
+        limiter = RateLimiter(rate=1, per=60)
+        limiter._check_local("old")
+        clock.ns += 30 * SECOND_NS
+        limiter._check_local("recent")
+        
+        clock.ns += 31 * SECOND_NS
+        limiter._check_local("new")
+        
+        assert list(limiter.clients) == ["recent", "new"]
+
+    def test_check_without_redis(self, monkeypatch, clock):
+        """Test that check() falls back to the in-memory counts when Redis is unavailable."""
+        monkeypatch.setattr(cache, "redis_client", None)
+        limiter = RateLimiter(rate=1, per=60)
+        
+        assert asyncio.run(limiter.check("client")) == (True, 60)
+        assert asyncio.run(limiter.is_allowed("client")) is False
+
+    def test_no_limit(self, monkeypatch, clock):
+        """Test that a rate of 0 allows every request without counting it."""
+        monkeypatch.setattr(cache, "redis_client", None)
+        limiter = RateLimiter(rate=0, per=60)
+        
+        assert all(asyncio.run(limiter.is_allowed("client")) for _ in range(5))
+        assert not limiter.clients
@@ -27,20 +27,98 @@ export interface ApiResponse<T> {
   pagination?: PaginationInfo;
 }
 
+export interface UploadJob {
+  job_id: string;
+  status: 'pending' | 'processing' | 'completed' | 'failed';
+  message?: string;
+  result: DocumentType | null;
+  error: { error: string; message: string; details?: any } | null;
+}
+
+// Interval between polls of a background upload job
+const JOB_POLL_INTERVAL_MS = 1000;
+// Longest time to wait for a background upload job before giving up
+const JOB_MAX_WAIT_MS = 10 * 60 * 1000;
+// Longest delay between polls after transient errors
+const JOB_MAX_RETRY_DELAY_MS = 30 * 1000;
+
+// Shape a failure like an API error response so callers handle both the same way
+const uploadJobError = (jobError: UploadJob['error'], fallbackMessage: string): Error => {
+  const error: any = new Error(jobError?.message || fallbackMessage);
+  error.response = { data: { status: 'error', ...jobError } };
+  return error;
+};
+
+// Delay before retrying a poll that failed with a network error, rate limit (429) or
+// server error (5xx), or null if the error isn't transient. Retry-After is used when sent.
+const pollRetryDelayMs = (error: any, retries: number): number | null => {
+  const status = error.response?.status;
+  if (status !== undefined && status !== 429 && status < 500) {
+    return null;
+  }
+  const retryAfter = Number(error.response?.headers?.['retry-after']);
+  if (retryAfter > 0) {
+    return retryAfter * 1000;
+  }
+  return Math.min(JOB_POLL_INTERVAL_MS * 2 ** retries, JOB_MAX_RETRY_DELAY_MS);
+};
+
+// Poll a background upload job until it completes or fails, giving up after JOB_MAX_WAIT_MS
+const waitForUploadJob = async (jobId: string): Promise<DocumentType> => {
+  const deadline = Date.now() + JOB_MAX_WAIT_MS;
+  let retries = 0;
+  
+  while (true) {
+    let delay = JOB_POLL_INTERVAL_MS;
+    let job: UploadJob | null = null;
+    try {
+      const response = await axios.get<ApiResponse<UploadJob>>(`${API_URL}/jobs/${jobId}`);
+      job = response.data.data;
+      retries = 0;
+    } catch (error: any) {
+      const retryDelay = pollRetryDelayMs(error, retries);
+      if (retryDelay === null) {
+        throw error;
+      }
+      retries += 1;
+      delay = retryDelay;
+    }
+    
+    if (job?.status === 'completed' && job.result) {
+      return job.result;
+    }
+    if (job?.status === 'failed') {
+      throw uploadJobError(job.error, 'File processing failed');
+    }
+    
+    if (Date.now() + delay > deadline) {
+      throw uploadJobError(
+        {
+          error: 'UPLOAD_JOB_TIMEOUT',
+          message: 'File processing is taking longer than expected. Check the document list again later.'
+        },
+        'File processing timed out'
+      );
+    }
+    await new Promise(resolve => setTimeout(resolve, delay));
+  }
+};
+
 // File upload service
 export const uploadDocument = async (file: File): Promise<DocumentType> => {
   const formData = new FormData();
   formData.append('file', file);
   
   try {
-    const response = await axios.post<ApiResponse<DocumentType>>(`${API_URL}/files/upload/`, formData, {
+    const response = await axios.post<ApiResponse<{ job_id: string }>>(`${API_URL}/files/upload/`, formData, {
       headers: {
         'Content-Type': 'multipart/form-data',
       },
     });
     
     if (response.data.status === 'success' && response.data.data) {
-      return response.data.data;
+      // Extraction and classification run in the background on the server
+      return await waitForUploadJob(response.data.data.job_id);
     } else {
       throw new Error(response.data.message || 'Unknown error');
     }